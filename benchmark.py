@@ -0,0 +1,630 @@
+"""Benchmark headless des étapes de vision sur des toiles synthétiques.
+
+Génère une toile aux couleurs de GAME_COLORS (résolution, taille de case, densité, bruit
+façon JPEG et cases coupées par le bord configurables), chronomètre chaque étape, vérifie
+la détection par rapport à la vérité terrain et échoue (code 1) en cas de régression.
+
+    python benchmark.py --width 2560 --height 1440 --cell 20 --noise 3
+    python benchmark.py --save bench.json          # enregistre une référence
+    python benchmark.py --baseline bench.json      # compare à la référence
+
+Ne dépend ni de pyautogui ni de keyboard.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from logic import (BlobBuffer, BotVision, CellGrid, ClickPlanner, PaletteLUT, TileScanner, Viewport, ZoneGrid,
+                   CELL_PARTIAL, GAME_COLORS, estimate_grid)
+from capture import SyntheticCanvas
+
+
+# --- SCÈNE SYNTHÉTIQUE ---
+def add_jpeg_noise(frame, sigma, rng):
+    """Bruit gaussien plus un décalage par bloc 8x8, comme les artefacts de compression"""
+    if sigma <= 0:
+        return frame
+    h, w = frame.shape[:2]
+    noisy = frame.astype(np.int16)
+    noisy += rng.normal(0, sigma, frame.shape).astype(np.int16)
+    blocks = rng.integers(-int(sigma), int(sigma) + 1, (-(-h // 8), -(-w // 8), 1), dtype=np.int16)
+    noisy += np.repeat(np.repeat(blocks, 8, axis=0), 8, axis=1)[:h, :w]
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def make_scene(args, rng):
+    """Toile rendue puis recadrée de `offset` pixels : les cases du bord sont partielles"""
+    cell = args.cell
+    canvas = SyntheticCanvas(args.width + cell, args.height + cell, cell, args.target, args.density, args.markers,
+                             seed=int(rng.integers(1 << 31)))
+    ox, oy = args.offset % cell, args.offset % cell
+    frame = canvas.render()[oy:oy + args.height, ox:ox + args.width]
+    frame = add_jpeg_noise(np.ascontiguousarray(frame), args.noise, rng)
+
+    # Vérité terrain : centres des marqueurs restants, hors d'une case de bord
+    centers = canvas.marker_centers() - np.array([ox, oy])
+    inside = ((centers[:, 0] >= cell) & (centers[:, 0] < args.width - cell) &
+              (centers[:, 1] >= cell) & (centers[:, 1] < args.height - cell))
+    return {
+        "canvas": canvas,
+        "frame": frame,
+        "truth": centers[inside],
+        "grid": CellGrid(-ox, -oy, cell),
+    }
+
+
+def fractional_grid(pitch, width, height, offset, noise, rng):
+    """Grille de cases pleines au pas non entier : les bords tombent à floor(offset + k * pas)"""
+    palette = np.array([c["rgb"] for c in GAME_COLORS], dtype=np.uint8)
+    cols = np.floor((np.arange(width) - offset) / pitch).astype(np.int64)
+    rows = np.floor((np.arange(height) - offset) / pitch).astype(np.int64)
+    cols -= cols.min()
+    rows -= rows.min()
+    cells = rng.integers(0, len(palette), (rows.max() + 1, cols.max() + 1))
+    return add_jpeg_noise(np.ascontiguousarray(palette[cells[rows][:, cols]]), noise, rng)
+
+
+def grid_scene(cell, density, markers, width, height, offset, noise, rng):
+    """Toile recadrée de `offset` px pour estimate_grid : marqueurs et cases vides compris"""
+    canvas = SyntheticCanvas(width + cell, height + cell, cell, GAME_COLORS[0]["rgb"], density, markers,
+                             seed=int(rng.integers(1 << 31)))
+    frame = canvas.render()[offset:offset + height, offset:offset + width]
+    return add_jpeg_noise(np.ascontiguousarray(frame), noise, rng)
+
+
+def slow_drag(scene, args, rng, frames=30):
+    """Écart max (px) entre la vue suivie par Viewport et le vrai défilement, glissements lents.
+
+    La toile glisse de 1 à 3 px par frame : moins que ce que voit la corrélation à l'échelle
+    réduite, l'affinage au pixel doit tout de même cumuler chaque pas.
+    """
+    canvas = scene["canvas"].render()
+    margin = frames * 3
+    h, w = min(480, canvas.shape[0] - 2 * margin), min(640, canvas.shape[1] - 2 * margin)
+    errors = []
+    for speed in ((1, 0), (0, -1), (2, 0), (1, 2), (-3, 1)):
+        x = y = margin
+        viewport = Viewport()
+        viewport.update(canvas[y:y + h, x:x + w])
+        for _ in range(frames):
+            # Le contenu glisse de `speed` à l'écran : la fenêtre recule d'autant sur la toile
+            x, y = x - speed[0], y - speed[1]
+            viewport.update(add_jpeg_noise(np.ascontiguousarray(canvas[y:y + h, x:x + w]), args.noise, rng))
+        errors.append(max(abs(viewport.view[0] - speed[0] * frames), abs(viewport.view[1] - speed[1] * frames)))
+    return max(errors)
+
+
+def interior(points, args):
+    cell = args.cell
+    return points[(points[:, 0] >= cell) & (points[:, 0] < args.width - cell) &
+                  (points[:, 1] >= cell) & (points[:, 1] < args.height - cell)]
+
+
+def match_points(found, truth, radius):
+    """(précision, rappel) en appariant chaque point trouvé à un point vrai à moins de `radius`"""
+    if not len(found) or not len(truth):
+        return (1.0 if not len(found) else 0.0), (1.0 if not len(truth) else 0.0)
+    # Les deux ensembles sont sur une grille : une clé par case suffit à apparier
+    key_truth = {(int(x // radius), int(y // radius)) for x, y in truth}
+    hits = sum((int(x // radius), int(y // radius)) in key_truth for x, y in found)
+    return hits / len(found), min(hits, len(truth)) / len(truth)
+
+
+# --- ANCIEN CHEMIN (référence) ---
+class _ArrayPixels:
+    """Accès pixels[x, y] façon PIL sur un ndarray, quand Pillow n'est pas installé"""
+
+    def __init__(self, arr):
+        self.arr = arr
+
+    def __getitem__(self, xy):
+        return tuple(self.arr[xy[1], xy[0]].tolist())
+
+
+def legacy_pixels(frame):
+    try:
+        from PIL import Image
+        return Image.fromarray(frame).load()
+    except ImportError:
+        return _ArrayPixels(frame)
+
+
+def legacy_scan(pixels, w, h, target_rgb, tol, threshold, step=4):
+    """Balayage d'origine de bot_loop : pas de 4 px, zones traitées en liste, rayons de measure_blob_at"""
+    targets = []
+    zones = []
+    y = 0
+    while y < h:
+        x = 0
+        while x < w:
+            if any(z[0] <= x <= z[2] and z[1] <= y <= z[3] for z in zones):
+                x += step
+                continue
+            if not BotVision.check_match(pixels[x, y], target_rgb, tol):
+                x += step
+                continue
+            blob_w, blob_h, bbox = BotVision.measure_blob_at(pixels, x, y, w, h, target_rgb, tol)
+            zones.append(bbox)
+            if max(blob_w, blob_h) < threshold:
+                targets.append(((bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2))
+            x = bbox[2] + 2
+        y += step
+    return np.array(targets, dtype=np.int64).reshape(-1, 2)
+
+
+# --- CHRONOMÉTRAGE ---
+def time_stage(fn, repeat):
+    """Médiane des durées de `repeat` appels (et le dernier résultat)"""
+    durations = []
+    result = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - t0)
+    return float(np.median(durations)), result
+
+
+def steady_state(scene, args):
+    """Mémoire en régime établi : scan incrémental, filtre et zones comme l'analyse du bot.
+
+    Chaque frame place un marqueur de plus ; la toile est remise à neuf à chaque tour.
+    Après une chauffe qui amène les tampons à leur taille maximale, tracemalloc mesure ce
+    qui reste alloué à la fin : en régime établi, ça ne doit pas croître avec les frames.
+    """
+    cell, target, tol = args.cell, args.target, args.tol
+    h, w = min(480, args.height), min(640, args.width)
+    base = np.ascontiguousarray(scene["frame"][:h, :w])
+    frame = base.copy()
+    half = cell // 2
+    points = scene["truth"]
+    points = points[(points[:, 0] < w - cell) & (points[:, 1] < h - cell)].tolist() or [(w // 2, h // 2)]
+    scanner = TileScanner(target, tol)
+    picked = BlobBuffer()
+    zones = ZoneGrid(w, h, max(1, cell // 4))
+    threshold = cell * 0.7
+
+    def step(i):
+        if i % len(points) == 0:
+            np.copyto(frame, base)
+        x, y = points[i % len(points)]
+        frame[y - half + 1:y + half, x - half + 1:x + half] = target
+        zones.clear()
+        blobs = scanner.scan(frame)
+        cx = (blobs["x0"] + blobs["x1"]) // 2
+        cy = (blobs["y0"] + blobs["y1"]) // 2
+        keep = (BotVision.blob_sizes(blobs) < threshold) & ~zones.contains_many(cx, cy)
+        zones.add_blobs(picked.select(blobs, keep))
+
+    warmup = max(args.alloc_frames // 10, 2 * len(points))
+    for i in range(warmup):
+        step(i)
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for i in range(warmup, warmup + args.alloc_frames):
+        step(i)
+    seconds = (time.perf_counter() - t0) / args.alloc_frames
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, {
+        "frames": args.alloc_frames,
+        "growth_kb": current / 1024,
+        "peak_kb": peak / 1024,
+        "buffer_growths": scanner._cache.grown + scanner._scratch.grown + scanner._out.grown + picked.grown,
+    }
+
+
+def idle_governor(args):
+    """Bot complet sur une toile synthétique : coût à vide et latence de réveil du FrameGovernor.
+
+    Une fois tous les marqueurs placés, on mesure le CPU et les captures pendant
+    `idle_seconds`, puis on fait réapparaître des marqueurs un par un, après un temps
+    immobile assez long pour que l'attente entre captures soit au maximum. Un marqueur sur deux
+    est accompagné d'un `wake()` du moteur, comme un clic de l'utilisateur.
+    """
+    from capture import SyntheticSource
+    from engine import BotEngine
+    w, h = min(640, args.width), min(480, args.height)
+    source = SyntheticSource(w, h, args.cell, args.target, seed=args.seed)
+    canvas = source.canvas
+    engine = BotEngine()
+    engine.target_rgb = args.target
+    engine.tolerance = args.tol
+    engine.full_block_size = args.cell
+    engine.play_area = (0, 0, w, h)
+    engine.delay = 0.01
+    engine.track_pan = False
+    engine.poll_interval, engine.idle_interval = args.poll, args.idle_poll
+    pipeline = engine.start(source=source, click=source.click, screen_size=(w, h))
+    try:
+        deadline = time.monotonic() + 30
+        while canvas.marker_centers().size and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(max(0.5, args.idle_poll * 2))
+
+        grabs, frames = source.grabs, pipeline.frame_count
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        time.sleep(args.idle_seconds)
+        wall = time.perf_counter() - wall0
+        idle = {
+            "cpu": (time.process_time() - cpu0) / wall,
+            "captures_per_s": (source.grabs - grabs) / wall,
+            "analyses_per_s": (pipeline.frame_count - frames) / wall,
+        }
+
+        rng = np.random.default_rng(args.seed)
+        rows, cols = canvas.markers.shape
+        wakeups = {False: [], True: []}
+        for i in range(2 * args.wakeups):
+            r, c = int(rng.integers(1, rows - 1)), int(rng.integers(1, cols - 1))
+            canvas.cells[r, c] = canvas.background
+            t0 = time.perf_counter()
+            canvas.markers[r, c] = True
+            if i % 2:
+                engine.wake()
+            while canvas.markers[r, c] and time.perf_counter() - t0 < 5:
+                time.sleep(0.001)
+            wakeups[bool(i % 2)].append(time.perf_counter() - t0)
+            time.sleep(max(0.5, args.idle_poll * 2))
+    finally:
+        engine.close()
+    for key, times in (("wakeup", wakeups[False]), ("event_wakeup", wakeups[True])):
+        idle[f"{key}_median"] = float(np.median(times)) if times else 0.0
+        idle[f"{key}_max"] = float(np.max(times)) if times else 0.0
+    return idle
+
+
+def refused_start(args):
+    """Démarrage refusé (région d'une autre couleur) avec enregistrement : rien ne doit rester ouvert.
+
+    Vrai si `start` lève ValueError sans créer de session et que `close` passe ensuite.
+    """
+    import os
+    import tempfile
+    from capture import SyntheticSource
+    from engine import BotEngine
+    from pipeline import Region
+    other = next(c["name"] for c in GAME_COLORS if tuple(c["rgb"]) != tuple(args.target))
+    source = SyntheticSource(320, 240, args.cell, args.target, seed=args.seed)
+    engine = BotEngine()
+    engine.target_rgb = args.target
+    engine.full_block_size = args.cell
+    engine.play_area = (0, 0, 320, 240)
+    engine.regions = [Region("autre", (0, 0, 320, 240), colors=[other])]
+    with tempfile.TemporaryDirectory() as path:
+        engine.record_path = os.path.join(path, "session")
+        try:
+            engine.start(source=source, click=source.click, screen_size=(320, 240))
+            refused = False
+        except ValueError:
+            refused = True
+        try:
+            engine.close()
+        except Exception as e:
+            print(f"close après un démarrage refusé : {e!r}")
+            return False
+        return refused and engine.recorder is None and not os.path.exists(engine.record_path)
+
+
+def budget_rate(budget=3, offered=20):
+    """Débit affiché juste après une rafale sur une région limitée à `budget` clics/min"""
+    import queue
+    from pipeline import Region, RegionScheduler
+    scheduler = RegionScheduler([Region("limitée", (0, 0, 10, 10), budget=budget)])
+    for i in range(offered):
+        scheduler.offer(0, (i,))
+    while True:
+        try:
+            scheduler.get_nowait()
+        except queue.Empty:
+            return scheduler.stats()[0]["rate"]
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    scene = make_scene(args, rng)
+    frame, truth, grid = scene["frame"], scene["truth"], scene["grid"]
+    target, tol, cell = args.target, args.tol, args.cell
+    threshold = cell * 0.7
+    h, w = frame.shape[:2]
+    megapixels = w * h / 1e6
+
+    stages = {}
+    accuracy = {}
+
+    def record(name, seconds, pixels=megapixels):
+        stages[name] = {
+            "seconds": seconds,
+            "fps": 1.0 / seconds if seconds > 0 else float("inf"),
+            "mpps": pixels / seconds if seconds > 0 else float("inf"),
+        }
+
+    def blob_targets(blobs):
+        blobs = blobs[BotVision.blob_sizes(blobs) < threshold]
+        return np.stack([(blobs["x0"] + blobs["x1"]) // 2, (blobs["y0"] + blobs["y1"]) // 2], axis=1)
+
+    # Étapes vectorisées
+    seconds, mask = time_stage(lambda: BotVision.match_mask(frame, target, tol), args.repeat)
+    record("match_mask", seconds)
+    seconds, blobs = time_stage(lambda: BotVision.label_blobs(mask), args.repeat)
+    record("label_blobs", seconds)
+    found = interior(blob_targets(blobs), args)
+    accuracy["blobs"] = match_points(found, truth, cell)
+
+    lut = PaletteLUT.load(tol)
+    seconds, _ = time_stage(lambda: lut.classify(frame), args.repeat)
+    record("palette_classify", seconds)
+
+    seconds, (states, (c0, r0)) = time_stage(
+        lambda: BotVision.classify_lattice(frame, (0, 0), grid, target, tol), args.repeat)
+    record("lattice", seconds)
+    rows, cols = np.nonzero(states == CELL_PARTIAL)
+    xs, ys = grid.center(cols + c0, rows + r0)
+    accuracy["lattice"] = match_points(interior(np.stack([xs, ys], axis=1), args), truth, cell)
+
+    seconds, estimated = time_stage(lambda: estimate_grid(frame), args.repeat)
+    record("estimate_grid", seconds)
+    if estimated is None:
+        accuracy["grid_pitch_error"] = float("inf")
+        accuracy["grid_phase_error"] = float("inf")
+    else:
+        accuracy["grid_pitch_error"] = abs(estimated.pitch - cell) / cell
+        dx = (estimated.x0 - grid.x0) % cell
+        dy = (estimated.y0 - grid.y0) % cell
+        accuracy["grid_phase_error"] = max(min(dx, cell - dx), min(dy, cell - dy))
+
+    # Pas fractionnaires (cases de tailles alternées) : le pas ne doit pas revenir doublé
+    errors = []
+    for pitch in args.fractional_pitches:
+        estimated = estimate_grid(fractional_grid(pitch, min(w, 800), min(h, 600), args.offset % 7 + 0.3,
+                                                  args.noise, rng))
+        errors.append(float("inf") if estimated is None else abs(estimated.pitch - pitch) / pitch)
+    accuracy["grid_fractional_error"] = max(errors) if errors else 0.0
+
+    # Marqueurs (côtés au tiers de case) et toiles clairsemées : le pas ne doit pas tomber au tiers
+    errors = []
+    for pitch in args.grid_cells:
+        for density, markers in args.grid_scenes:
+            # Assez grand pour qu'une toile clairsemée à grandes cases montre encore des bords de case
+            frame_grid = grid_scene(pitch, density, markers, min(w, 1600), min(h, 1200), args.offset % pitch,
+                                    args.noise, rng)
+            estimated = estimate_grid(frame_grid)
+            errors.append(float("inf") if estimated is None else abs(estimated.pitch - pitch) / pitch)
+    accuracy["grid_scenes_error"] = max(errors) if errors else 0.0
+
+    accuracy["pan_drag_error"] = float(slow_drag(scene, args, rng))
+
+    # Scan incrémental : on place quelques marqueurs puis on re-scanne
+    scanner = TileScanner(target, tol)
+    scanner.scan(frame)
+    changed = frame.copy()
+    for x, y in truth[:max(1, len(truth) // 50)].tolist():
+        changed[y - cell // 2 + 1:y + cell // 2, x - cell // 2 + 1:x + cell // 2] = target
+    seconds, delta_blobs = time_stage(lambda: scanner.scan(changed), 1)
+    delta_blobs = delta_blobs.copy()  # vue sur le tampon du scanner, réécrite au scan suivant
+    record("tile_delta_changed", seconds)
+    seconds, _ = time_stage(lambda: scanner.scan(changed), args.repeat)
+    record("tile_delta_static", seconds)
+    full_blobs = BotVision.label_blobs(BotVision.match_mask(changed, target, tol))
+    accuracy["tile_delta_exact"] = float(np.array_equal(np.sort(delta_blobs[["x0", "y0", "x1", "y1"]]),
+                                                        np.sort(full_blobs[["x0", "y0", "x1", "y1"]])))
+
+    if args.workers > 1:
+        from parallel import ParallelScanner
+        parallel = ParallelScanner(target, tol, args.workers)
+        try:
+            reference = BotVision.find_blobs(frame, target, tol)
+            seconds, split = time_stage(lambda: parallel.find_blobs(frame), args.repeat)
+            record(f"parallel_find_blobs_x{args.workers}", seconds)
+            accuracy["parallel_exact"] = float(split.tobytes() == reference.tobytes())
+
+            # Scan incrémental dont les grandes zones modifiées passent par le pool
+            filled = frame.copy()
+            for x, y in truth.tolist():
+                filled[y - cell // 2 + 1:y + cell // 2, x - cell // 2 + 1:x + cell // 2] = target
+            split_scanner = TileScanner(target, tol, find_all=parallel.find_blobs)
+
+            def rescan():
+                split_scanner.scan(frame)
+                return split_scanner.scan(filled)
+            seconds, delta = time_stage(rescan, args.repeat)
+            record(f"parallel_tile_delta_x{args.workers}", seconds)
+            reference = BotVision.label_blobs(BotVision.match_mask(filled, target, tol))
+            accuracy["parallel_exact"] *= float(np.array_equal(np.sort(delta[["x0", "y0", "x1", "y1"]]),
+                                                               np.sort(reference[["x0", "y0", "x1", "y1"]])))
+        finally:
+            parallel.close()
+
+    planner = ClickPlanner(band=cell)
+    seconds, _ = time_stage(lambda: planner.plan(found, (0, 0)), args.repeat)
+    record("click_planner", seconds, pixels=0.0)
+    stages["click_planner"]["targets"] = int(len(found))
+    stages["click_planner"]["gain"] = (1.0 - planner.last_length / planner.last_raster_length
+                                       if planner.last_raster_length else 0.0)
+
+    memory = None
+    if args.alloc_frames > 0:
+        seconds, memory = steady_state(scene, args)
+        record("steady_state_frame", seconds, pixels=min(480, h) * min(640, w) / 1e6)
+
+    governor = None
+    if args.idle_seconds > 0:
+        governor = idle_governor(args)
+        record("governor_wakeup", governor["wakeup_median"], pixels=0.0)
+        record("governor_event_wakeup", governor["event_wakeup_median"], pixels=0.0)
+
+    accuracy["refused_start_clean"] = float(refused_start(args))
+    accuracy["budget_rate"] = float(budget_rate())
+
+    # Ancien chemin : check_match par pixel, measure_blob_at par graine
+    if not args.skip_legacy:
+        pixels = legacy_pixels(frame)
+        sample = [(x, y) for y in range(0, h, 4) for x in range(0, w, 4)][:20000]
+        seconds, _ = time_stage(lambda: [BotVision.check_match(pixels[x, y], target, tol) for x, y in sample], 1)
+        record("legacy_check_match", seconds * (w // 4) * (h // 4) / len(sample))
+        seeds = truth[:200].tolist()
+        seconds, _ = time_stage(
+            lambda: [BotVision.measure_blob_at(pixels, x, y, w, h, target, tol) for x, y in seeds], 1)
+        record("legacy_measure_blob_at", seconds * len(truth) / max(1, len(seeds)))
+        seconds, legacy = time_stage(lambda: legacy_scan(pixels, w, h, target, tol, threshold), 1)
+        record("legacy_scan", seconds)
+        accuracy["legacy"] = match_points(interior(legacy, args), truth, cell)
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "save")},
+        "stages": stages,
+        "accuracy": {k: (list(v) if isinstance(v, tuple) else v) for k, v in accuracy.items()},
+        "truth": int(len(truth)),
+        "memory": memory,
+        "governor": governor,
+    }
+
+
+# --- VÉRIFICATIONS ---
+def check(results, args, baseline=None):
+    """Liste des régressions (vide si tout passe)"""
+    failures = []
+    acc = results["accuracy"]
+    for name in ("blobs", "lattice"):
+        precision, recall = acc[name]
+        if precision < args.min_precision or recall < args.min_recall:
+            failures.append(f"{name}: précision {precision:.3f} / rappel {recall:.3f}")
+    if acc["grid_pitch_error"] > 0.005 or acc["grid_phase_error"] > 0.25:
+        failures.append(f"estimate_grid: erreur de pas {acc['grid_pitch_error']:.4f}, "
+                        f"d'origine {acc['grid_phase_error']:.2f}px")
+    if acc.get("grid_fractional_error", 0.0) > 0.005:
+        failures.append(f"estimate_grid: erreur de pas {acc['grid_fractional_error']:.4f} sur un pas fractionnaire")
+    if acc.get("grid_scenes_error", 0.0) > 0.005:
+        failures.append(f"estimate_grid: erreur de pas {acc['grid_scenes_error']:.4f} "
+                        "avec marqueurs ou toile clairsemée")
+    if acc.get("pan_drag_error", 0.0) > 0:
+        failures.append(f"viewport: glissement lent suivi à {acc['pan_drag_error']:.0f} px près")
+    if acc["tile_delta_exact"] < 1.0:
+        failures.append("tile_delta: résultat différent du scan complet")
+    if acc.get("refused_start_clean", 1.0) < 1.0:
+        failures.append("engine: démarrage refusé mal nettoyé (enregistrement ouvert ou close en échec)")
+    if acc.get("budget_rate", 0.0) > 3:
+        failures.append(f"scheduler: {acc['budget_rate']:.0f} clics/min affichés pour un budget de 3/min")
+    if acc.get("parallel_exact", 1.0) < 1.0:
+        failures.append("parallel: résultat différent du scan en un seul processus")
+    governor = results.get("governor")
+    if governor and governor["wakeup_max"] > args.idle_poll + args.max_wakeup:
+        failures.append(f"governor: réveil en {governor['wakeup_max'] * 1000:.0f} ms, au-delà de --idle-poll")
+    if governor and governor["event_wakeup_max"] > args.max_wakeup:
+        failures.append(f"governor: réveil sur événement en {governor['event_wakeup_max'] * 1000:.0f} ms")
+    memory = results.get("memory")
+    if memory and memory["growth_kb"] > args.max_alloc_growth:
+        failures.append(f"mémoire : +{memory['growth_kb']:.0f} Ko sur {memory['frames']} frames")
+
+    # Aller-retour JSON pour comparer des tuples avec les listes relues
+    if baseline and baseline.get("config") != json.loads(json.dumps(results["config"])):
+        print("Référence obtenue avec une autre configuration : temps non comparés")
+        baseline = None
+    if baseline:
+        for name, ref in baseline.get("stages", {}).items():
+            cur = results["stages"].get(name)
+            if cur is None or name.startswith("legacy"):
+                continue
+            if cur["seconds"] > ref["seconds"] * (1.0 + args.max_slowdown):
+                failures.append(f"{name}: {cur['seconds'] * 1000:.2f} ms contre {ref['seconds'] * 1000:.2f} ms")
+    return failures
+
+
+def report(results):
+    print(f"Toile {results['config']['width']}x{results['config']['height']}, case {results['config']['cell']}px, "
+          f"{results['truth']} marqueurs")
+    print(f"{'étape':<24}{'ms':>10}{'frames/s':>12}{'MP/s':>10}")
+    for name, st in results["stages"].items():
+        print(f"{name:<24}{st['seconds'] * 1000:>10.2f}{st['fps']:>12.1f}{st['mpps']:>10.1f}")
+    planner = results["stages"]["click_planner"]
+    print(f"Planificateur : {planner['targets']} cibles, trajet réduit de {planner['gain'] * 100:.0f} %")
+    for name, value in results["accuracy"].items():
+        if isinstance(value, list):
+            print(f"{name:<24}précision {value[0]:.3f}  rappel {value[1]:.3f}")
+        else:
+            print(f"{name:<24}{value:.4f}")
+    memory = results.get("memory")
+    if memory:
+        print(f"Régime établi : {memory['frames']} frames, +{memory['growth_kb']:.1f} Ko restés alloués, "
+              f"pic {memory['peak_kb']:.0f} Ko, {memory['buffer_growths']} agrandissement(s) de tampon")
+    governor = results.get("governor")
+    if governor:
+        print(f"Au repos : CPU {governor['cpu'] * 100:.1f} %, {governor['captures_per_s']:.1f} captures/s, "
+              f"{governor['analyses_per_s']:.1f} analyses/s")
+        print(f"Réveil : médian {governor['wakeup_median'] * 1000:.0f} ms, max {governor['wakeup_max'] * 1000:.0f} ms"
+              f" | sur événement : médian {governor['event_wakeup_median'] * 1000:.0f} ms, "
+              f"max {governor['event_wakeup_max'] * 1000:.0f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark headless de la vision ARC PLACER")
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--cell", type=int, default=20, help="taille d'une case en pixels")
+    parser.add_argument("--density", type=float, default=0.5, help="proportion de cases pleines")
+    parser.add_argument("--markers", type=float, default=0.1, help="proportion de cases à placer")
+    parser.add_argument("--noise", type=float, default=3.0, help="écart-type du bruit façon JPEG")
+    parser.add_argument("--offset", type=int, default=7, help="décalage de la grille (cases partielles au bord)")
+    parser.add_argument("--color", default="Black", help="nom de la couleur cible dans GAME_COLORS")
+    parser.add_argument("--tol", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="mesure aussi ParallelScanner avec N processus")
+    parser.add_argument("--fractional-pitches", type=float, nargs="*",
+                        default=[5.5, 6.25, 9.5, 12.5, 15.25, 20.5, 24.5, 30.75],
+                        help="pas non entiers testés par estimate_grid")
+    parser.add_argument("--grid-cells", type=int, nargs="*", default=[8, 12, 13, 15, 20, 30, 60],
+                        help="pas des toiles à marqueurs testées par estimate_grid")
+    parser.add_argument("--grid-scenes", type=lambda v: tuple(float(x) for x in v.split(":")), nargs="*",
+                        default=[(0.5, 0.3), (0.9, 0.3), (0.1, 0.3), (0.1, 0.05)],
+                        help="densité:marqueurs des toiles testées par estimate_grid")
+    parser.add_argument("--alloc-frames", type=int, default=2000,
+                        help="frames du test de mémoire en régime établi (0 = pas de test)")
+    parser.add_argument("--max-alloc-growth", type=float, default=64.0,
+                        help="croissance mémoire tolérée en régime établi (Ko)")
+    parser.add_argument("--idle-seconds", type=float, default=2.0,
+                        help="bot complet au repos : durée de la mesure CPU (0 = pas de mesure)")
+    parser.add_argument("--wakeups", type=int, default=5, help="marqueurs à faire réapparaître pour la latence")
+    parser.add_argument("--poll", type=float, default=0.02, help="FrameGovernor : première attente (s)")
+    parser.add_argument("--idle-poll", type=float, default=0.2, help="FrameGovernor : attente maximale (s)")
+    parser.add_argument("--max-wakeup", type=float, default=0.1,
+                        help="réveil toléré (s) après un événement, ou en plus de --idle-poll sans événement")
+    parser.add_argument("--skip-legacy", action="store_true", help="ne pas mesurer l'ancien chemin (lent)")
+    parser.add_argument("--min-precision", type=float, default=0.99)
+    parser.add_argument("--min-recall", type=float, default=0.99)
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="ralentissement toléré face à --baseline")
+    parser.add_argument("--baseline", help="résultats JSON de référence")
+    parser.add_argument("--save", help="enregistre les résultats en JSON")
+    args = parser.parse_args(argv)
+    color = next((c for c in GAME_COLORS if c["name"] == args.color), None)
+    if color is None:
+        parser.error(f"couleur inconnue : {args.color}")
+    args.target = color["rgb"]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    report(results)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=4)
+    failures = check(results, args, baseline)
+    for failure in failures:
+        print(f"ÉCHEC {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import numpy as np
+
+from logic import BotVision, PaletteLUT
+
+
+# --- MODÈLE (BLUEPRINT) ---
+class Blueprint:
+    """Image modèle quantifiée sur GAME_COLORS, une valeur par case.
+
+    `cells` est un tableau (lignes, colonnes) uint8 d'indices palette ; PaletteLUT.NO_MATCH
+    marque les cases transparentes, que le bot ignore.
+    """
+
+    def __init__(self, cells):
+        self.cells = np.asarray(cells, dtype=np.uint8)
+
+    @property
+    def rows(self):
+        return self.cells.shape[0]
+
+    @property
+    def cols(self):
+        return self.cells.shape[1]
+
+    @classmethod
+    def from_image(cls, image, alpha_threshold=128, strip=256):
+        """Charge un PNG (chemin ou image PIL) et le quantifie par bandes sur la couleur la plus proche"""
+        from PIL import Image
+        img = Image.open(image) if isinstance(image, str) else image
+        img = img.convert("RGBA")
+        nearest = PaletteLUT.load(None)
+        cells = np.empty((img.height, img.width), dtype=np.uint8)
+        for y in range(0, img.height, strip):
+            band = np.asarray(img.crop((0, y, img.width, min(img.height, y + strip))))
+            out = nearest.classify(band[:, :, :3])
+            out[band[:, :, 3] < alpha_threshold] = PaletteLUT.NO_MATCH
+            cells[y:y + band.shape[0]] = out
+        return cls(cells)
+
+    def placements(self, frame, frame_origin, grid, tol=15, colors=None, tile=256):
+        """Génère les cases (col, ligne) du modèle mal remplies à l'écran, regroupées par couleur.
+
+        `grid` (CellGrid) place la case (0, 0) du modèle à l'écran. Une seule lecture de pixel
+        au centre de chaque case visible, classée avec la PaletteLUT à tolérance `tol`. Le
+        modèle est parcouru par tuiles de `tile` cases et les écarts gardés dans un masque
+        d'un bit par case, la mémoire reste donc bornée même pour de très grands modèles.
+        La frame ne doit pas changer tant que le générateur est consommé.
+        """
+        frame = BotVision.to_array(frame)
+        lut = PaletteLUT.load(tol)
+        tile = max(8, tile - tile % 8)
+        fx, fy = frame_origin
+        region = (fx, fy, fx + frame.shape[1], fy + frame.shape[0])
+        c0, r0, c1, r1 = grid.visible(region)
+        c0, r0 = max(c0, 0), max(r0, 0)
+        c1, r1 = min(c1, self.cols), min(r1, self.rows)
+        if c0 >= c1 or r0 >= r1:
+            return
+
+        # 1re passe : masque des écarts, un bit par case visible
+        width = c1 - c0
+        mismatch = np.zeros((r1 - r0, -(-width // 8)), dtype=np.uint8)
+        counts = np.zeros(256, dtype=np.int64)
+        for tr in range(r0, r1, tile):
+            for tc in range(c0, c1, tile):
+                rows = np.arange(tr, min(tr + tile, r1))
+                cols = np.arange(tc, min(tc + tile, c1))
+                want = self.cells[tr:tr + len(rows), tc:tc + len(cols)]
+                xs, ys = grid.center(cols, rows)
+                xs = np.clip(xs - fx, 0, frame.shape[1] - 1)
+                ys = np.clip(ys - fy, 0, frame.shape[0] - 1)
+                got = lut.classify(frame[ys[:, None], xs[None, :]])
+                bad = (got != want) & (want != PaletteLUT.NO_MATCH)
+                if colors is not None:
+                    bad &= np.isin(want, colors)
+                if bad.any():
+                    mismatch[tr - r0:tr - r0 + len(rows), (tc - c0) // 8:(tc - c0) // 8 + tile // 8] = \
+                        np.packbits(bad, axis=1)
+                    counts += np.bincount(want[bad], minlength=256)
+
+        # 2e passe : une couleur à la fois, tuile par tuile
+        for color in np.nonzero(counts)[0].tolist():
+            for tr in range(r0, r1, tile):
+                for tc in range(c0, c1, tile):
+                    n_rows, n_cols = min(tile, r1 - tr), min(tile, c1 - tc)
+                    packed = mismatch[tr - r0:tr - r0 + n_rows, (tc - c0) // 8:(tc - c0) // 8 + tile // 8]
+                    bad = np.unpackbits(packed, axis=1, count=n_cols).astype(bool)
+                    bad &= self.cells[tr:tr + n_rows, tc:tc + n_cols] == color
+                    for r, c in zip(*np.nonzero(bad)):
+                        yield (tc + int(c), tr + int(r)), color
@@ -0,0 +1,144 @@
+import time
+
+import numpy as np
+
+from logic import BotVision, GAME_COLORS
+
+# Couleur du fond de la toile (cases vides)
+CANVAS_BACKGROUND = (255, 255, 255)
+
+
+# --- SOURCES D'IMAGES ---
+class FrameSource:
+    """Fournit des captures de la zone de jeu dans un tampon préalloué et réutilisé.
+
+    `region` est le rectangle écran (x0, y0, x1, y1) capturé. `grab()` renvoie toujours le
+    même tableau (H, W, 3) uint8 : le copier si l'image doit survivre à la capture suivante.
+    """
+
+    def __init__(self, region):
+        x0, y0, x1, y1 = region
+        self.region = (int(x0), int(y0), int(x1), int(y1))
+        self.width = self.region[2] - self.region[0]
+        self.height = self.region[3] - self.region[1]
+        if self.width <= 0 or self.height <= 0:
+            raise ValueError(f"Zone de capture vide : {region}")
+        self.buffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.grabs = 0
+
+    @property
+    def origin(self):
+        return self.region[0], self.region[1]
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.grabs if self.grabs else 0.0
+
+    def grab(self):
+        """Capture une image dans le tampon et mesure la latence de la capture"""
+        t0 = time.perf_counter()
+        self._fill(self.buffer)
+        self.last_latency = time.perf_counter() - t0
+        self.total_latency += self.last_latency
+        self.grabs += 1
+        return self.buffer
+
+    def _fill(self, out):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ScreenSource(FrameSource):
+    """Capture uniquement le rectangle demandé à l'écran"""
+
+    def __init__(self, region):
+        super().__init__(region)
+        import pyautogui
+        self._screenshot = pyautogui.screenshot
+
+    def _fill(self, out):
+        pic = self._screenshot(region=(self.region[0], self.region[1], self.width, self.height))
+        np.copyto(out, BotVision.to_array(pic)[:self.height, :self.width])
+
+
+class SyntheticSource(FrameSource):
+    """Toile générée (voir make_synthetic_canvas), sans écran ni fichier.
+
+    `click(x, y)` simule un placement : la case sous le point devient pleine, ce qui
+    permet de faire tourner toute la boucle du bot sur une machine sans affichage.
+    """
+
+    def __init__(self, width, height, cell=20, target_rgb=(0, 0, 0), density=0.5, marker_ratio=0.1,
+                 origin=(0, 0), seed=None):
+        super().__init__((origin[0], origin[1], origin[0] + width, origin[1] + height))
+        self.canvas = SyntheticCanvas(width, height, cell, target_rgb, density, marker_ratio, seed)
+
+    def click(self, x, y):
+        return self.canvas.place(x - self.region[0], y - self.region[1])
+
+    def _fill(self, out):
+        self.canvas.render(out)
+
+
+# --- TOILE SYNTHÉTIQUE ---
+class SyntheticCanvas:
+    """Grille de cases aux couleurs de GAME_COLORS avec des marqueurs à compléter.
+
+    Une case pleine occupe tout le pas `cell` ; un marqueur est un petit carré centré de la
+    couleur cible (plus petit que 0.7 x cell), comme les cases à placer dans le jeu.
+    """
+
+    def __init__(self, width, height, cell=20, target_rgb=(0, 0, 0), density=0.5, marker_ratio=0.1, seed=None):
+        self.width, self.height, self.cell = int(width), int(height), int(cell)
+        self.target_rgb = tuple(target_rgb)
+        self.rng = np.random.default_rng(seed)
+        self.palette = np.array([c["rgb"] for c in GAME_COLORS] + [CANVAS_BACKGROUND], dtype=np.uint8)
+        self.background = len(self.palette) - 1
+        self.target_index = next((i for i, c in enumerate(GAME_COLORS) if c["rgb"] == self.target_rgb), None)
+        if self.target_index is None:
+            raise ValueError(f"Couleur cible hors palette : {target_rgb}")
+
+        rows = -(-self.height // self.cell)
+        cols = -(-self.width // self.cell)
+        # Les cases pleines ne prennent jamais la couleur cible : seuls les marqueurs la portent
+        choices = np.array([i for i in range(len(GAME_COLORS)) if i != self.target_index])
+        self.cells = np.full((rows, cols), self.background, dtype=np.int16)
+        full = self.rng.random((rows, cols)) < density
+        self.cells[full] = self.rng.choice(choices, size=int(full.sum()))
+        self.markers = self.rng.random((rows, cols)) < marker_ratio
+
+    def marker_centers(self):
+        """Centres écran (x, y) des marqueurs restants, entièrement visibles"""
+        rows, cols = np.nonzero(self.markers)
+        xs = cols * self.cell + self.cell // 2
+        ys = rows * self.cell + self.cell // 2
+        keep = ((cols + 1) * self.cell <= self.width) & ((rows + 1) * self.cell <= self.height)
+        return np.stack([xs[keep], ys[keep]], axis=1)
+
+    def place(self, x, y):
+        """Remplit la case sous (x, y) avec la couleur cible ; vrai si c'était un marqueur"""
+        r, c = int(y) // self.cell, int(x) // self.cell
+        if not (0 <= r < self.cells.shape[0] and 0 <= c < self.cells.shape[1]):
+            return False
+        was_marker = bool(self.markers[r, c])
+        self.markers[r, c] = False
+        self.cells[r, c] = self.target_index
+        return was_marker
+
+    def render(self, out=None):
+        if out is None:
+            out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        full = np.repeat(np.repeat(self.palette[self.cells], self.cell, axis=0), self.cell, axis=1)
+        out[...] = full[:self.height, :self.width]
+
+        size = max(1, self.cell // 3)
+        lo = (self.cell - size) // 2
+        rows, cols = np.nonzero(self.markers)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            y, x = r * self.cell + lo, c * self.cell + lo
+            out[y:y + size, x:x + size] = self.target_rgb
+        return out
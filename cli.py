@@ -0,0 +1,225 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from logic import GAME_COLORS, ProfileStore, load_config
+from engine import BotEngine
+
+
+# --- LIGNE DE COMMANDE ---
+def parse_size(text):
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Arc Placer sans interface : capture, analyse et clics en console.")
+    parser.add_argument("--profile", help="réglages JSON (couleur, délai, zone, grille...) à charger")
+    parser.add_argument("--no-cache", action="store_true", help="ignore le profil enregistré pour cet écran")
+    parser.add_argument("--color", help="nom de la couleur cible (voir --list-colors)")
+    parser.add_argument("--list-colors", action="store_true", help="affiche les couleurs connues et quitte")
+    parser.add_argument("--delay", help="délai entre deux clics (s)")
+    parser.add_argument("--tol", type=int, help="tolérance couleur")
+    parser.add_argument("--block", type=int, help="taille d'une case pleine (px) si pas de calibration")
+    parser.add_argument("--area", type=int, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), help="zone de jeu à l'écran")
+    parser.add_argument("--calibrate-auto", action="store_true", help="estime la grille sur une capture de la zone")
+    parser.add_argument("--regions", help="régions JSON : [{name, rect, colors, priority, budget}, ...]")
+    parser.add_argument("--lattice", action="store_true", help="une sonde par case de la grille calibrée")
+    parser.add_argument("--blueprint", help="modèle PNG à reproduire")
+    parser.add_argument("--no-pan", action="store_true", help="ne suit pas le défilement de la toile")
+    parser.add_argument("--workers", type=int,
+                        help="processus d'analyse des scans complets et grandes zones modifiées (0 = un seul)")
+    parser.add_argument("--poll", type=float, help="toile immobile : première attente entre deux captures (s)")
+    parser.add_argument("--idle-poll", type=float, help="toile immobile : attente maximale entre deux captures (s)")
+    parser.add_argument("--trace", help="fichier JSONL où écrire les durées de chaque frame")
+    parser.add_argument("--duration", type=float, default=0, help="arrêt après N secondes (0 = jusqu'à Ctrl+C)")
+    parser.add_argument("--dry-run", action="store_true", help="capture et analyse, sans cliquer")
+    parser.add_argument("--synthetic", type=parse_size, metavar="WxH",
+                        help="toile générée de WxH px au lieu de l'écran (clics simulés)")
+    parser.add_argument("--cell", type=int, default=20, help="pas de la toile générée")
+    parser.add_argument("--seed", type=int, default=0, help="graine de la toile générée")
+    parser.add_argument("--record", metavar="DOSSIER", help="enregistre frames, calibration et clics de la session")
+    parser.add_argument("--record-format", choices=("raw", "npz"), default="raw",
+                        help="raw : lisible par memmap ; npz : blocs compressés")
+    parser.add_argument("--replay", metavar="DOSSIER", help="rejoue une session enregistrée (sans écran) et quitte")
+    parser.add_argument("--targets-out", help="avec --replay : écrit les cibles de chaque frame en JSONL")
+    parser.add_argument("--expect", help="avec --replay : compare aux cibles d'un --targets-out précédent")
+    return parser.parse_args(argv)
+
+
+def build_engine(args, store=None, screen=None):
+    config = load_config()
+    engine = BotEngine()
+    engine.apply_profile({"color_name": config.get("color_name"), "delay": config.get("delay", "0.2")})
+    if store is not None and screen:
+        engine.restore_profile(store, screen)
+    return apply_options(engine, args)
+
+
+def apply_options(engine, args):
+    """Applique --profile puis les options explicites de la ligne de commande"""
+    if args.profile:
+        with open(args.profile, "r", encoding="utf-8") as f:
+            engine.apply_profile(json.load(f))
+    if args.color:
+        engine.set_color(args.color)
+    if args.delay is not None:
+        engine.delay = engine.parse_delay(args.delay)
+    if args.tol is not None:
+        engine.tolerance = args.tol
+    if args.block:
+        engine.full_block_size = args.block
+    if args.area:
+        engine.play_area = tuple(args.area)
+    if args.regions:
+        with open(args.regions, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        engine.load_regions(data["regions"] if isinstance(data, dict) else data)
+    if args.lattice:
+        engine.lattice = True
+    if args.blueprint:
+        engine.load_blueprint(args.blueprint)
+    if args.poll is not None:
+        engine.poll_interval = args.poll
+    if args.idle_poll is not None:
+        engine.idle_interval = args.idle_poll
+    if args.trace:
+        engine.trace_path = args.trace
+    if args.no_pan:
+        engine.track_pan = False
+    if args.workers is not None:
+        engine.workers = args.workers
+    return engine
+
+
+def run_replay(args):
+    from session import Session
+    session = Session(args.replay)
+    engine = BotEngine()
+    engine.apply_profile(session.profile)
+    apply_options(engine, args)
+    if not engine.calibrated:
+        print("Session sans calibration : utiliser --profile ou --block.")
+        return 1
+
+    lines = []
+
+    def on_frame(index, targets):
+        cx = (targets["x0"] + targets["x1"]) // 2
+        cy = (targets["y0"] + targets["y1"]) // 2
+        lines.append(json.dumps({"frame": index, "targets": np.stack([cx, cy], axis=1).tolist()}))
+
+    t0 = time.perf_counter()
+    stats = engine.replay(session, on_frame)
+    elapsed = time.perf_counter() - t0
+    engine.close()
+    print(f"{len(session.sequence)} frames ({session.count} distinctes) en {elapsed:.2f}s, "
+          f"{len(session.sequence) / max(elapsed, 1e-9):.1f} f/s | {stats.totals['targets']} cibles, "
+          f"{len(session.clicks)} clics enregistrés")
+    print(stats.status_line())
+    if args.targets_out:
+        with open(args.targets_out, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+    if args.expect:
+        with open(args.expect, "r", encoding="utf-8") as f:
+            expected = [line.rstrip("\n") for line in f]
+        for index, (got, want) in enumerate(zip(lines, expected)):
+            if got != want:
+                print(f"Écart à la frame {index}")
+                return 1
+        if len(lines) != len(expected):
+            print(f"{len(lines)} frames contre {len(expected)} attendues")
+            return 1
+        print("Cibles identiques à la référence.")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_colors:
+        for c in GAME_COLORS:
+            print(f"{c['name']:<20} {c['hex']}")
+        return 0
+    if args.replay:
+        return run_replay(args)
+    store = screen = None
+    try:
+        if not args.synthetic and not args.no_cache:
+            # Profil de calibration de cet écran (résolution + DPI), comme l'interface
+            store = ProfileStore()
+            screen = BotEngine().screen_key()
+        engine = build_engine(args, store, screen)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Erreur : {e}")
+        return 2
+
+    source = click = screen_size = None
+    if args.synthetic:
+        from capture import SyntheticSource
+        width, height = args.synthetic
+        source = SyntheticSource(width, height, args.cell, engine.target_rgb, seed=args.seed)
+        click = source.click
+        screen_size = (width, height)
+        if engine.play_area is None:
+            engine.play_area = (0, 0, width, height)
+        if not engine.calibrated and not args.calibrate_auto:
+            engine.full_block_size = args.cell
+
+    if args.calibrate_auto:
+        x0, y0, x1, y1 = engine.play_bounds(screen_size or engine.screen_size())
+        if source is not None:
+            ox, oy = source.origin
+            frame = source.grab()[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+        else:
+            frame = engine.screenshot(region=(x0, y0, x1 - x0, y1 - y0))
+        grid = engine.calibrate_from_area(frame, (x0, y0))
+        if grid is None:
+            print("Grille non détectée.")
+            return 1
+        print(f"Grille détectée : pas {grid.pitch:.1f}px, origine ({grid.x0:.1f}, {grid.y0:.1f})")
+        if store is not None:
+            engine.remember_profile(store, screen)
+            store.flush()
+    if not engine.calibrated:
+        print("Non calibré : utiliser --profile, --block ou --calibrate-auto.")
+        return 1
+
+    if args.dry_run:
+        def click(x, y):
+            pass
+
+    if args.record:
+        engine.record_path, engine.record_format = args.record, args.record_format
+
+    try:
+        pipeline = engine.start(source=source, click=click, screen_size=screen_size)
+    except ValueError as e:
+        print(f"Erreur : {e}")
+        engine.close()
+        return 2
+    print(f"Démarré ({engine.target_color['name'] if engine.target_color else engine.target_rgb}, "
+          f"délai {engine.delay}s, case {engine.full_block_size}px). Ctrl+C pour arrêter.")
+    deadline = time.monotonic() + args.duration if args.duration > 0 else None
+    recorder = engine.recorder
+    try:
+        while pipeline.running and (deadline is None or time.monotonic() < deadline):
+            time.sleep(1.0)
+            print(f"{pipeline.stats.status_line()} | {pipeline.ledger.summary()}")
+            if engine.regions:
+                print(f"  {pipeline.scheduler.summary()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+    print(f"{pipeline.frame_count} frames, {pipeline.target_count} cibles, {pipeline.click_count} clics "
+          f"({pipeline.ledger.summary()})")
+    if recorder is not None:
+        print(f"Session enregistrée : {recorder.meta['frames']} frames, {recorder.meta['clicks']} clics")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
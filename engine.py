@@ -0,0 +1,487 @@
+import itertools
+import os
+import random
+import time
+
+import numpy as np
+
+from logic import (BlobBuffer, BotVision, CellGrid, ClickPlanner, GridTracker, TileScanner, Viewport, ZoneGrid,
+                   CELL_PARTIAL, GAME_COLORS, estimate_grid, screen_key)
+from capture import ScreenSource
+from pipeline import BotPipeline, FrameGovernor, FrameStats, PlacementLedger, Region, RegionScheduler
+
+
+# --- MOTEUR SANS INTERFACE ---
+class BotEngine:
+    """Calibration, analyse et clics du bot, sans Tkinter.
+
+    L'interface et la ligne de commande ne font que renseigner ces attributs puis appeler
+    `start()`. pyautogui n'est importé qu'au moment de capturer ou cliquer à l'écran, on peut
+    donc piloter le moteur sur une machine sans affichage avec une autre source et un autre clic.
+    """
+
+    def __init__(self, target_rgb=None, delay=0.2, tolerance=15):
+        self.target_rgb = tuple(target_rgb) if target_rgb else GAME_COLORS[0]["rgb"]
+        self.delay = delay
+        self.tolerance = tolerance
+        self.full_block_size = 0
+        self.grid = None
+        self.play_area = None
+        self.blueprint = None
+        self.blueprint_path = None
+        self.lattice = False
+        self.tile = 64
+        self.track_pan = True
+        # PreviewFeed à alimenter pendant la course (aperçu en direct), ou None
+        self.preview = None
+        self.workers = 0
+        # Toile immobile : captures espacées de poll_interval à idle_interval (s), voir FrameGovernor
+        self.poll_interval = 0.02
+        self.idle_interval = 0.2
+        # Régions nommées (pipeline.Region) : remplacent play_area et la couleur unique si non vide
+        self.regions = []
+        self.trace_path = None
+        self.record_path = None
+        self.record_format = "raw"
+        self.recorder = None
+        self.pipeline = None
+        self._parallel = None
+
+    # --- ÉTAT ---
+    @property
+    def calibrated(self):
+        return self.full_block_size > 0
+
+    @property
+    def running(self):
+        return self.pipeline is not None and self.pipeline.running
+
+    @property
+    def target_color(self):
+        return next((c for c in GAME_COLORS if c["rgb"] == self.target_rgb), None)
+
+    def set_color(self, name):
+        color = next((c for c in GAME_COLORS if c["name"] == name), None)
+        if color is None:
+            raise ValueError(f"Couleur inconnue : {name}")
+        self.target_rgb = color["rgb"]
+        return color
+
+    @staticmethod
+    def parse_delay(text):
+        """Délai saisi par l'utilisateur ("0,2" accepté), au moins 0.01 s ; 0.1 s si illisible"""
+        try:
+            delay = float(str(text).replace(',', '.'))
+        except ValueError:
+            return 0.1
+        return max(0.01, delay)
+
+    def load_blueprint(self, path):
+        from blueprint import Blueprint
+        self.blueprint = Blueprint.from_image(path) if path else None
+        self.blueprint_path = path if path else None
+        return self.blueprint
+
+    # --- ÉCRAN ---
+    @staticmethod
+    def screen_size():
+        import pyautogui
+        return tuple(pyautogui.size())
+
+    @staticmethod
+    def screenshot(region=None):
+        import pyautogui
+        return BotVision.to_array(pyautogui.screenshot(region=region))
+
+    @staticmethod
+    def screen_click(x, y):
+        import pyautogui
+        ox, oy = random.randint(-1, 1), random.randint(-1, 1)
+        pyautogui.click(x + ox, y + oy)
+
+    @staticmethod
+    def screen_scale():
+        """Facteur d'échelle DPI de l'écran principal (1.0 hors Windows)"""
+        try:
+            import ctypes
+            return ctypes.windll.shcore.GetScaleFactorForDevice(0) / 100
+        except Exception:
+            return 1.0
+
+    def screen_key(self):
+        return screen_key(self.screen_size(), self.screen_scale())
+
+    def play_bounds(self, screen_size):
+        """Zone de jeu (x0, y0, x1, y1) : rectangle englobant des régions, sinon play_area,
+        sinon tout l'écran moins les bords"""
+        if self.regions:
+            rects = np.array([region.rect for region in self.regions])
+            return (int(rects[:, 0].min()), int(rects[:, 1].min()), int(rects[:, 2].max()), int(rects[:, 3].max()))
+        if self.play_area:
+            return tuple(self.play_area)
+        w_s, h_s = screen_size
+        return 20, 100, w_s - 20, h_s - 20
+
+    def capture_region(self, screen_size):
+        """Zone de jeu élargie d'un bloc, pour mesurer entièrement les blobs coupés par le bord"""
+        sx, sy, ex, ey = self.play_bounds(screen_size)
+        ref_size = self.full_block_size
+        w_s, h_s = screen_size
+        return max(0, sx - ref_size), max(0, sy - ref_size), min(w_s, ex + ref_size), min(h_s, ey + ref_size)
+
+    # --- CALIBRATION ---
+    def calibrate_at(self, frame, x, y, tol=30):
+        """Mesure la case pleine sous (x, y) dans une capture plein écran ; renvoie sa bbox.
+
+        La taille n'est retenue que si la case fait au moins 5 px.
+        """
+        arr = BotVision.to_array(frame)
+        h, w = arr.shape[:2]
+        # pixels[x, y] comme PIL, en int16 pour que les différences de check_match ne débordent pas
+        pixels = arr.transpose(1, 0, 2).astype(np.int16)
+        x, y = max(0, min(x, w - 1)), max(0, min(y, h - 1))
+        width, height, bbox = BotVision.measure_blob_at(pixels, x, y, w, h, tuple(pixels[x, y].tolist()), tol)
+        size = max(width, height)
+        if size >= 5:
+            self.full_block_size = size
+            # La case cliquée fixe l'origine de la grille, son côté en donne le pas
+            self.grid = CellGrid(bbox[0], bbox[1], size)
+        return bbox, size
+
+    def reset_calibration(self):
+        self.full_block_size = 0
+        self.grid = None
+        self.play_area = None
+
+    def calibrate_from_area(self, frame, origin):
+        """Estime la grille directement depuis une capture de la zone de jeu"""
+        grid = estimate_grid(frame, origin)
+        if grid is None or grid.pitch < 5:
+            return None
+        self.grid = grid
+        self.full_block_size = int(round(grid.pitch))
+        return grid
+
+    # --- BOUCLE ---
+    def screen_source(self, screen_size=None):
+        """Capture écran de la zone de jeu élargie"""
+        return ScreenSource(self.capture_region(screen_size or self.screen_size()))
+
+    def build_analyze(self, screen_size, stats, viewport=None, target_rgb=None):
+        """Fonction d'analyse `analyze(frame, origin)` -> cibles BLOB_DTYPE du mode courant.
+
+        Avec un `viewport` mis à jour avant chaque appel, l'analyse suit le défilement de la toile.
+        `target_rgb` remplace la couleur du moteur (une analyse par couleur des régions).
+        """
+        target_rgb = self.target_rgb if target_rgb is None else tuple(target_rgb)
+        ref_size = self.full_block_size
+        tol = self.tolerance
+        threshold = ref_size * 0.7
+        sx, sy, ex, ey = self.play_bounds(screen_size)
+
+        def panned():
+            # Décalage de la frame courante depuis la précédente : (0, 0), (dx, dy) ou None (vue perdue)
+            return viewport.last_shift if viewport is not None else (0, 0)
+
+        if self.blueprint is not None:
+            # Mode modèle : la case (0, 0) du modèle est la case calibrée au coin de la zone de jeu
+            # au démarrage (pas fractionnaire compris), puis suit la toile quand elle défile
+            color_index = next(i for i, c in enumerate(GAME_COLORS) if c["rgb"] == target_rgb)
+            blueprint = self.blueprint
+            anchor = self.grid.anchored(sx, sy) if self.grid is not None else CellGrid(sx, sy, ref_size)
+
+            def analyze(frame, origin):
+                view = viewport.view if viewport is not None else (0, 0)
+                grid = CellGrid(anchor.x0 + view[0], anchor.y0 + view[1], anchor.pitch)
+                play = frame[sy - origin[1]:ey - origin[1], sx - origin[0]:ex - origin[0]]
+                todo = blueprint.placements(play, (sx, sy), grid, tol, colors=[color_index])
+                cells = np.array([cell for cell, _ in itertools.islice(todo, 256)], dtype=np.int64).reshape(-1, 2)
+                return grid.cells_to_blobs(cells[:, 0], cells[:, 1])
+        elif self.lattice and self.grid is not None:
+            # Mode grille : 5 sondes par case calibrée au lieu d'une analyse pixel par pixel.
+            # La grille est ré-estimée régulièrement pour suivre les changements de zoom.
+            tracker = GridTracker(self.grid)
+
+            def analyze(frame, origin):
+                shift = panned()
+                if shift is None:
+                    tracker.last_check = None
+                elif shift != (0, 0):
+                    old = tracker.grid
+                    tracker.grid = CellGrid(old.x0 + shift[0], old.y0 + shift[1], old.pitch)
+                play = frame[sy - origin[1]:ey - origin[1], sx - origin[0]:ex - origin[0]]
+                grid = tracker.update(play, (sx, sy), time.monotonic())
+                states, (c0, r0) = BotVision.classify_lattice(play, (sx, sy), grid, target_rgb, tol)
+                rows, cols = np.nonzero(states == CELL_PARTIAL)
+                return grid.cells_to_blobs(cols + c0, rows + r0)
+        else:
+            # Entre deux frames, seules les tuiles modifiées sont ré-analysées
+            parallel = self.parallel_scanner() if target_rgb == self.target_rgb else None
+            scanner = TileScanner(target_rgb, tol, self.tile, parallel.find_blobs if parallel else None)
+            picked = BlobBuffer()
+
+            def analyze(frame, origin):
+                shift = panned()
+                if shift is not None and shift != (0, 0):
+                    # Cache décalé : seule la bande découverte est ré-étiquetée
+                    scanner.shift(*shift)
+                blobs = scanner.scan(frame, origin)
+                stats.add("blobs", scanner.last_label_time)
+                stats.count("blobs_found", len(blobs))
+                cx = (blobs["x0"] + blobs["x1"]) // 2
+                cy = (blobs["y0"] + blobs["y1"]) // 2
+                keep = (BotVision.blob_sizes(blobs) < threshold) & (cx >= sx) & (cx <= ex) & (cy >= sy) & (cy <= ey)
+                return picked.select(blobs, keep)
+        return analyze
+
+    # --- RÉGIONS ---
+    def check_regions(self, regions=None):
+        """ValueError si une région demande une autre couleur que celle du moteur.
+
+        Les clics posent toujours la couleur choisie dans le jeu (la palette ne change pas
+        en cours de route) : une région d'une autre couleur ne pourrait jamais être remplie.
+        """
+        color = self.target_color
+        for region in self.regions if regions is None else regions:
+            other = [name for name in region.colors if color is None or name != color["name"]]
+            if other:
+                raise ValueError(f"Région {region.name} : couleur {', '.join(other)} différente de la couleur "
+                                 f"choisie ({color['name'] if color else self.target_rgb})")
+
+    def load_regions(self, regions):
+        """Régions depuis une liste de dicts (Region.to_dict) ; ValueError si une couleur ne convient pas"""
+        loaded = [Region.from_dict(data) for data in regions]
+        self.check_regions(loaded)
+        self.regions = loaded
+        return loaded
+
+    def build_regions_analyze(self, screen_size, stats, viewport=None):
+        """Analyse multi-régions : `analyze(frame, origin)` -> (cibles, indice de région de chaque cible).
+
+        Une seule analyse sur le rectangle englobant toutes les régions ; chaque cible revient
+        ensuite à la première région qui la contient.
+        """
+        regions = self.regions
+        run = self.build_analyze(screen_size, stats, viewport)
+        picked = BlobBuffer()
+
+        def analyze(frame, origin):
+            targets = run(frame, origin)
+            cx = (targets["x0"] + targets["x1"]) // 2
+            cy = (targets["y0"] + targets["y1"]) // 2
+            owner = np.full(len(targets), -1, dtype=np.int64)
+            for i, region in enumerate(regions):
+                owner[(owner < 0) & region.contains(cx, cy)] = i
+            keep = owner >= 0
+            return picked.select(targets, keep), owner[keep]
+        return analyze
+
+    def build_pipeline(self, source=None, click=None, screen_size=None, on_stop=None):
+        """Assemble le pipeline ; par défaut capture et clics à l'écran via pyautogui"""
+        # Avant d'ouvrir l'enregistrement et la trace : un refus ne doit rien laisser ouvert
+        self.check_regions()
+        target_rgb = self.target_rgb
+        ref_size = self.full_block_size
+        tol = self.tolerance
+        stats = FrameStats(trace_path=self.trace_path)
+        if source is None:
+            screen_size = screen_size or self.screen_size()
+            source = self.screen_source(screen_size)
+        elif screen_size is None:
+            screen_size = (source.region[2], source.region[3])
+        if click is None:
+            click = self.screen_click
+        if self.record_path:
+            # Session rejouable : frames, calibration et clics (voir session.py)
+            from session import RecordingSource, SessionWriter
+            recorder = self.recorder = SessionWriter(self.record_path, source.region, screen_size, self.to_profile(),
+                                                     self.record_format)
+            source = RecordingSource(source, recorder)
+            base_click = click
+
+            def click(x, y):
+                recorder.add_click(x, y)
+                base_click(x, y)
+        viewport = Viewport() if self.track_pan else None
+        scheduler = None
+        if self.regions:
+            # Une file par région, servies équitablement selon leur priorité et leur budget
+            analyze = self.build_regions_analyze(screen_size, stats, viewport)
+            scheduler = RegionScheduler(self.regions)
+        else:
+            analyze = self.build_analyze(screen_size, stats, viewport)
+
+        def placed(frame, origin, xs, ys):
+            return BotVision.cells_filled(frame, origin, xs, ys, ref_size, target_rgb, tol)
+
+        # Chaque clic est revérifié sur la case cliquée quelques frames plus tard
+        ledger = PlacementLedger(placed, ref_size)
+        # Vignette d'un pixel par quart de case : plus fine qu'un marqueur, qu'on voit donc apparaître
+        governor = FrameGovernor(step=max(1, ref_size // 4), poll=self.poll_interval, max_interval=self.idle_interval)
+        return BotPipeline(source, analyze, click, self.delay, cell=max(1, ref_size // 4),
+                           planner=ClickPlanner(band=ref_size), stats=stats, ledger=ledger, viewport=viewport,
+                           preview=self.preview, governor=governor, scheduler=scheduler, on_stop=on_stop)
+
+    def replay(self, session, on_frame=None):
+        """Passe les frames d'une session (session.Session) dans l'analyse, aussi vite que possible.
+
+        Les réglages (calibration comprise) sont ceux du moteur : appliquer d'abord
+        session.profile. Les cibles de chaque frame sont ordonnées comme en direct puis
+        « cliquées » : comme une cible en attente dans BotPipeline, une case n'est plus
+        proposée tant qu'elle reste visible. `on_frame(index, targets)` reçoit les cibles
+        retenues de chaque frame.
+        Renvoie les FrameStats de la relecture.
+        """
+        stats = FrameStats(trace_path=self.trace_path)
+        viewport = Viewport() if self.track_pan else None
+        if self.regions:
+            analyze = self.build_regions_analyze(session.screen_size, stats, viewport)
+        else:
+            analyze = self.build_analyze(session.screen_size, stats, viewport)
+        planner = ClickPlanner(band=self.full_block_size)
+        zones = ZoneGrid(session.shape[1], session.shape[0], max(1, self.full_block_size // 4), session.region[:2])
+        origin = session.region[:2]
+        cursor = None
+        kept, ordered = BlobBuffer(), BlobBuffer()
+        try:
+            for index, frame in enumerate(session.frames()):
+                zones.clear()
+                stats.begin(index)
+                t0 = time.perf_counter()
+                if viewport is not None:
+                    shift = viewport.update(frame)
+                    if shift is not None and shift != (0, 0):
+                        zones.shift(*shift)
+                targets = analyze(frame, origin)
+                if isinstance(targets, tuple):
+                    targets = targets[0]
+                stats.add("scan", time.perf_counter() - t0 - stats.record["blobs"])
+                cx = (targets["x0"] + targets["x1"]) // 2
+                cy = (targets["y0"] + targets["y1"]) // 2
+                free = ~zones.contains_many(cx, cy, age=1)
+                # Les cibles déjà cliquées encore à l'écran restent marquées
+                zones.add_blobs(targets[~free])
+                targets, cx, cy = kept.select(targets, free), cx[free], cy[free]
+                if len(targets) > 1:
+                    t0 = time.perf_counter()
+                    order = planner.plan(np.stack([cx, cy], axis=1), cursor)
+                    stats.add("plan", time.perf_counter() - t0)
+                    targets = ordered.take(targets, order)
+                zones.add_blobs(targets)
+                if len(targets):
+                    last = targets[-1]
+                    cursor = ((int(last["x0"]) + int(last["x1"])) // 2, (int(last["y0"]) + int(last["y1"])) // 2)
+                stats.count("targets", len(targets))
+                stats.end()
+                if on_frame is not None:
+                    on_frame(index, targets)
+        finally:
+            stats.close()
+        return stats
+
+    def start(self, **kwargs):
+        """Démarre le bot (arguments de build_pipeline) ; renvoie le pipeline lancé"""
+        self.stop()
+        self.pipeline = self.build_pipeline(**kwargs)
+        self.pipeline.start()
+        return self.pipeline
+
+    def stop(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.recorder is not None:
+            # La session n'est complète qu'une fois les threads du pipeline arrêtés
+            if self.pipeline is not None:
+                self.pipeline.join(2.0)
+            self.recorder.close()
+            self.recorder = None
+
+    def wake(self):
+        """Clic ou touche de l'utilisateur : la toile va bouger, on reprend les captures tout de suite"""
+        if self.pipeline is not None:
+            self.pipeline.wake()
+
+    def parallel_scanner(self):
+        """Pool de processus si `workers` > 1 (scans complets, grandes zones modifiées), gardé entre démarrages"""
+        wanted = (self.target_rgb, self.tolerance, self.workers)
+        parallel = self._parallel
+        if parallel is not None and (parallel.target_rgb, parallel.tol, parallel.workers) != wanted:
+            parallel.close()
+            parallel = self._parallel = None
+        if parallel is None and self.workers > 1:
+            from parallel import ParallelScanner
+            parallel = self._parallel = ParallelScanner(self.target_rgb, self.tolerance, self.workers)
+        return parallel
+
+    def close(self):
+        """Arrête le bot et libère le pool de processus et la mémoire partagée"""
+        self.stop()
+        if self.pipeline is not None:
+            self.pipeline.join(2.0)
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
+
+    # --- PROFIL ---
+    def to_profile(self):
+        color = self.target_color
+        return {
+            "color_name": color["name"] if color else None,
+            "delay": self.delay,
+            "tolerance": self.tolerance,
+            "full_block_size": self.full_block_size,
+            "grid": [self.grid.x0, self.grid.y0, self.grid.pitch] if self.grid else None,
+            "play_area": list(self.play_area) if self.play_area else None,
+            "lattice": self.lattice,
+            "tile": self.tile,
+            "track_pan": self.track_pan,
+            "workers": self.workers,
+            "poll_interval": self.poll_interval,
+            "idle_interval": self.idle_interval,
+            "blueprint": self.blueprint_path,
+            "regions": [region.to_dict() for region in self.regions],
+        }
+
+    def apply_profile(self, data):
+        """Reprend les réglages d'un profil (les clés absentes ou inconnues gardent leur valeur)"""
+        color = next((c for c in GAME_COLORS if c["name"] == data.get("color_name")), None)
+        if color is not None:
+            self.target_rgb = color["rgb"]
+        if "delay" in data:
+            self.delay = self.parse_delay(data["delay"])
+        self.tolerance = int(data.get("tolerance", self.tolerance))
+        self.full_block_size = int(data.get("full_block_size") or self.full_block_size)
+        if data.get("grid"):
+            self.grid = CellGrid(*data["grid"])
+        elif self.full_block_size and self.grid is None and data.get("play_area"):
+            self.grid = CellGrid(data["play_area"][0], data["play_area"][1], self.full_block_size)
+        if data.get("play_area"):
+            self.play_area = tuple(int(v) for v in data["play_area"])
+        self.lattice = bool(data.get("lattice", self.lattice))
+        self.tile = int(data.get("tile") or self.tile)
+        self.track_pan = bool(data.get("track_pan", self.track_pan))
+        self.workers = int(data.get("workers", self.workers) or 0)
+        self.poll_interval = float(data.get("poll_interval", self.poll_interval))
+        self.idle_interval = float(data.get("idle_interval", self.idle_interval))
+        if "regions" in data:
+            regions = [Region.from_dict(region) for region in data["regions"] or []]
+            try:
+                self.check_regions(regions)
+                self.regions = regions
+            except ValueError as e:
+                print(f"Info: régions du profil ignorées ({e})")
+        if data.get("blueprint") and os.path.exists(data["blueprint"]):
+            self.load_blueprint(data["blueprint"])
+
+    def restore_profile(self, store, key):
+        """Reprend le profil enregistré pour l'écran `key` (ProfileStore) ; vrai si le bot est calibré"""
+        profile = store.get(key)
+        if profile is None:
+            return False
+        self.apply_profile(profile)
+        return self.calibrated
+
+    def remember_profile(self, store, key):
+        """Enregistre (en différé) les réglages courants pour l'écran `key` s'ils sont complets"""
+        if self.calibrated:
+            store.put(key, self.to_profile())
@@ -1,17 +1,13 @@
 import tkinter as tk
-from tkinter import ttk
-import pyautogui
-import keyboard
-import threading
+from tkinter import ttk, filedialog
 import time
-import random
-import ctypes
 import os
 import sys
-import math
 
-# On importe la logique, les couleurs, et les fonctions de sauvegarde
-from logic import BotVision, GAME_COLORS, load_config, save_config
+# On importe les couleurs et les fonctions de sauvegarde ; la vision et les clics sont dans le moteur
+from logic import GAME_COLORS, ProfileStore, get_app_folder, load_config, save_config
+from engine import BotEngine
+from pipeline import PreviewFeed
 
 
 def resource_path(relative_path):
@@ -51,6 +47,47 @@ class ToolTip:
             self.tip_window = None
 
 
+# --- FENÊTRE D'APERÇU ---
+class PreviewWindow:
+    """Affiche la dernière frame d'un PreviewFeed dans une seule PhotoImage réutilisée.
+
+    La fenêtre va chercher l'image toutes les `interval_ms` depuis la boucle Tk : le thread
+    d'analyse ne touche jamais à Tk et ne l'attend pas.
+    """
+
+    def __init__(self, root, feed, bg, interval_ms=125):
+        self.root = root
+        self.feed = feed
+        self.interval_ms = interval_ms
+        self.seen = -1
+        self.top = tk.Toplevel(root)
+        self.top.title("Aperçu")
+        self.top.configure(bg=bg)
+        self.top.attributes("-topmost", True)
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+        # Sans largeur ni hauteur : l'image prend la taille de chaque frame reçue
+        self.photo = tk.PhotoImage()
+        tk.Label(self.top, image=self.photo, bg=bg).pack()
+        tk.Label(self.top, text="bleu : détections | jaune : cibles | rose : clics à vérifier", bg=bg,
+                 fg="#6c7086", font=("Segoe UI", 8)).pack(pady=(2, 4))
+        self.root.after(self.interval_ms, self.refresh)
+
+    def refresh(self):
+        if self.top is None:
+            return
+        latest = self.feed.take(self.seen)
+        if latest is not None:
+            self.seen, data = latest
+            self.photo.configure(data=PreviewFeed.render(data), format="PPM")
+        self.root.after(self.interval_ms, self.refresh)
+
+    def close(self):
+        self.feed.close()
+        if self.top is not None:
+            self.top.destroy()
+            self.top = None
+
+
 # --- APPLICATION PRINCIPALE ---
 class WplaceBotApp:
     def __init__(self, root):
@@ -65,7 +102,7 @@ class WplaceBotApp:
         self.setup_dark_mode_title_bar()
 
         # --- FENÊTRE ---
-        self.root.geometry("260x465")
+        self.root.geometry("260x595")
         self.root.resizable(True, True)
         self.root.attributes("-topmost", True)
         self.root.attributes("-alpha", 0.95)
@@ -90,10 +127,12 @@ class WplaceBotApp:
         self.setup_styles()
 
         # --- VARIABLES & CHARGEMENT CONFIG ---
-        self.running = False
-        self.full_block_size = tk.IntVar(value=0)
-        self.play_area = None
-        self.tolerance = 15
+        self.engine = BotEngine()
+        self.lattice_mode = tk.BooleanVar(value=False)
+        self.trace_enabled = tk.BooleanVar(value=False)
+        self.record_enabled = tk.BooleanVar(value=False)
+        self.preview_enabled = tk.BooleanVar(value=False)
+        self.preview = None
         self.status_var = tk.StringVar(value="En attente...")
 
         # 1. On charge le fichier JSON
@@ -113,11 +152,27 @@ class WplaceBotApp:
 
         self.create_widgets()
 
+        # 4. Profil de calibration de cet écran : si on le connaît, le bot peut démarrer tout de suite
+        self.profiles = ProfileStore()
+        self.screen = self.current_screen()
+        if self.screen and self.engine.restore_profile(self.profiles, self.screen):
+            self.show_engine_settings()
+            self.log(f"Profil {self.screen} chargé.")
+
         # --- HOTKEYS ---
         try:
+            import keyboard
             keyboard.add_hotkey('s', self.toggle_bot_safe)
+            keyboard.add_hotkey('q', self.stop_bot_safe)
+            keyboard.on_press(lambda event: self.engine.wake())
         except Exception as e:
             print(f"Erreur Hotkey: {e}")
+        # Un clic, un glissement ou la molette annoncent un changement de la toile : capture immédiate
+        try:
+            import mouse
+            mouse.hook(lambda event: isinstance(event, (mouse.ButtonEvent, mouse.WheelEvent)) and self.engine.wake())
+        except Exception as e:
+            print(f"Info: réveil à la souris indisponible ({e})")
 
     # --- SAUVEGARDE A LA FERMETURE ---
     def on_close(self):
@@ -127,6 +182,9 @@ class WplaceBotApp:
 
         # On sauvegarde dans le fichier via logic.py
         save_config(current_color, current_delay)
+        self.remember_profile()
+        self.profiles.flush()
+        self.engine.close()
 
         # On ferme l'appli proprement
         self.root.destroy()
@@ -140,12 +198,14 @@ class WplaceBotApp:
     # --- SETUP SYSTÈME ---
     def setup_dpi_awareness(self):
         try:
+            import ctypes
             ctypes.windll.shcore.SetProcessDpiAwareness(1)
         except:
             pass
 
     def setup_dark_mode_title_bar(self):
         try:
+            import ctypes
             self.root.update()
             value = ctypes.c_int(2)
             ctypes.windll.dwmapi.DwmSetWindowAttribute(
@@ -211,6 +271,24 @@ class WplaceBotApp:
         self.btn_calib.pack(fill="x", pady=2)
         self.btn_zone = ttk.Button(f_conf, text="2. Zone de Jeu", command=self.start_zone_select)
         self.btn_zone.pack(fill="x", pady=2)
+        self.btn_blueprint = ttk.Button(f_conf, text="3. Modèle PNG (optionnel)", command=self.load_blueprint)
+        self.btn_blueprint.pack(fill="x", pady=2)
+        tk.Checkbutton(f_conf, text="Échantillonner une sonde par case", variable=self.lattice_mode,
+                       bg=self.bg_color, fg=self.fg_color, selectcolor=self.btn_color,
+                       activebackground=self.bg_color, activeforeground=self.fg_color,
+                       font=("Segoe UI", 8)).pack(anchor="w")
+        tk.Checkbutton(f_conf, text="Enregistrer la trace (JSONL)", variable=self.trace_enabled,
+                       bg=self.bg_color, fg=self.fg_color, selectcolor=self.btn_color,
+                       activebackground=self.bg_color, activeforeground=self.fg_color,
+                       font=("Segoe UI", 8)).pack(anchor="w")
+        tk.Checkbutton(f_conf, text="Enregistrer la session (rejouable)", variable=self.record_enabled,
+                       bg=self.bg_color, fg=self.fg_color, selectcolor=self.btn_color,
+                       activebackground=self.bg_color, activeforeground=self.fg_color,
+                       font=("Segoe UI", 8)).pack(anchor="w")
+        tk.Checkbutton(f_conf, text="Aperçu de la détection", variable=self.preview_enabled,
+                       bg=self.bg_color, fg=self.fg_color, selectcolor=self.btn_color,
+                       activebackground=self.bg_color, activeforeground=self.fg_color,
+                       font=("Segoe UI", 8)).pack(anchor="w")
         self.lbl_info = tk.Label(f_conf, text="Non calibré", bg=self.bg_color, fg="#6c7086",
                                  font=("Segoe UI", 8, "italic"))
         self.lbl_info.pack(pady=(5, 0))
@@ -228,12 +306,13 @@ class WplaceBotApp:
         self.status_bar.pack(side="bottom", fill="x")
 
     def log(self, message):
+        # Tk redessine au prochain passage dans la boucle : pas de update_idletasks à chaque message
         self.status_var.set(f"> {message}")
-        self.root.update_idletasks()
 
     def toggle_setup_buttons(self, state):
         self.btn_calib.config(state=state)
         self.btn_zone.config(state=state)
+        self.btn_blueprint.config(state=state)
 
     def cancel_overlay(self, event=None):
         if hasattr(self, 'top') and self.top:
@@ -283,80 +362,126 @@ class WplaceBotApp:
     def toggle_bot_safe(self):
         self.root.after(0, self.toggle_bot)
 
+    def stop_bot_safe(self):
+        if self.engine.running:
+            self.root.after(0, self.toggle_bot)
+
     def toggle_bot(self):
-        if not self.running:
-            self.running = True
+        if not self.engine.running:
+            if not self.check_screen():
+                return
+            self.sync_engine()
+            self.remember_profile()
+            self.open_preview()
+            try:
+                self.engine.start(on_stop=self.on_pipeline_stopped)
+            except ValueError as e:
+                self.log(f"Erreur : {e}")
+                return
             self.btn_start.config(text="⏹ STOP (Touche 'Q')", style="TButton")
             self.log("RUNNING... ('Q' pour stop)")
-            threading.Thread(target=self.bot_loop, daemon=True).start()
+            self.root.after(1000, self.refresh_stats)
         else:
-            self.running = False
+            self.engine.stop()
             self.btn_start.config(text="▶  START (Touche 'S')", style="Start.TButton")
-            self.log("Arrêté.")
-
-    def bot_loop(self):
-        target_rgb = self.target_color_rgb
-        ref_size = self.full_block_size.get()
-        tol = self.tolerance
-        threshold = ref_size * 0.7
-        scan_step = 4
-
+            self.log(f"Arrêté. {self.engine.pipeline.ledger.summary()}")
+
+    def refresh_stats(self):
+        # Affichage limité à 2 fois par seconde : la mesure ne doit pas ralentir le bot
+        if self.engine.running:
+            line = self.engine.pipeline.stats.status_line()
+            if self.engine.regions:
+                line += f" | {self.engine.pipeline.scheduler.summary()}"
+            self.status_var.set(f"> {line}")
+            self.root.after(500, self.refresh_stats)
+
+    def on_pipeline_stopped(self):
+        # Arrêt venu d'un thread du pipeline (erreur) : on remet l'interface à jour côté Tk
+        self.root.after(0, lambda: (self.btn_start.config(text="▶  START (Touche 'S')", style="Start.TButton"),
+                                    self.log("Arrêté.")))
+
+    def sync_engine(self):
+        # Les réglages saisis dans la fenêtre passent au moteur juste avant le démarrage
+        engine = self.engine
+        engine.target_rgb = self.target_color_rgb
+        engine.delay = engine.parse_delay(self.user_delay.get())
+        engine.lattice = self.lattice_mode.get()
+        engine.trace_path = None
+        if self.trace_enabled.get():
+            engine.trace_path = os.path.join(get_app_folder(), time.strftime("trace-%Y%m%d-%H%M%S.jsonl"))
+        engine.record_path = None
+        if self.record_enabled.get():
+            engine.record_path = os.path.join(get_app_folder(), "sessions", time.strftime("session-%Y%m%d-%H%M%S"))
+
+    def open_preview(self):
+        # Un flux neuf par course ; la fenêtre de la course précédente est remplacée
+        if self.preview is not None:
+            self.preview.close()
+            self.preview = None
+        if self.preview_enabled.get():
+            self.preview = PreviewWindow(self.root, PreviewFeed(), self.bg_color)
+        self.engine.preview = self.preview.feed if self.preview is not None else None
+
+    # --- PROFILS ---
+    def current_screen(self):
         try:
-            base_delay = float(self.user_delay.get().replace(',', '.'))
-            if base_delay < 0.01: base_delay = 0.01
-        except:
-            base_delay = 0.1
-
-        pic_test = pyautogui.screenshot()
-        w_s, h_s = pic_test.size
-        sx, sy, ex, ey = 20, 100, w_s - 20, h_s - 20
-        if self.play_area:
-            sx, sy, ex, ey = self.play_area
-
-        while self.running:
-            if keyboard.is_pressed('q'):
-                self.root.after(0, self.toggle_bot)
-                break
-
-            pic = pyautogui.screenshot()
-            pixels = pic.load()
-            found = False
-            processed_zones = []
-
-            y = sy
-            while y < ey:
-                if not self.running: break
-                x = sx
-                while x < ex:
-                    if keyboard.is_pressed('q'): break
-                    if self.is_in_processed_zone(x, y, processed_zones):
-                        x += scan_step;
-                        continue
-                    if not BotVision.check_match(pixels[x, y], target_rgb, tol):
-                        x += scan_step;
-                        continue
-
-                    blob_w, blob_h, bbox = BotVision.measure_blob_at(pixels, x, y, w_s, h_s, target_rgb, tol)
-                    blob_size = max(blob_w, blob_h)
-                    processed_zones.append(bbox)
-
-                    if blob_size < threshold:
-                        cx, cy = (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
-                        if sx <= cx <= ex and sy <= cy <= ey:
-                            ox, oy = random.randint(-1, 1), random.randint(-1, 1)
-                            pyautogui.click(cx + ox, cy + oy)
-                            actual_delay = base_delay + random.uniform(0, base_delay * 0.3)
-                            time.sleep(actual_delay)
-                            found = True
-                    x = bbox[2] + 2
-                y += scan_step
-            if not found: time.sleep(0.5)
-
-    def is_in_processed_zone(self, x, y, zones):
-        for z in zones:
-            if z[0] <= x <= z[2] and z[1] <= y <= z[3]: return True
+            return self.engine.screen_key()
+        except Exception as e:
+            print(f"Info: écran non détecté ({e})")
+            return None
+
+    def remember_profile(self):
+        if self.screen:
+            self.sync_engine()
+            self.engine.remember_profile(self.profiles, self.screen)
+
+    def check_screen(self):
+        # Résolution ou échelle changée depuis la calibration : la taille de case et la zone ne valent plus rien
+        screen = self.current_screen()
+        if screen == self.screen:
+            return True
+        self.screen = screen
+        self.engine.reset_calibration()
+        if screen and self.engine.restore_profile(self.profiles, screen):
+            self.show_engine_settings()
+            self.log(f"Écran changé, profil {screen} chargé.")
+            return True
+        self.update_info_label()
+        self.btn_start.config(state="disabled")
+        self.log("Écran changé : recalibre.")
         return False
 
+    def show_engine_settings(self):
+        # Reporte dans la fenêtre les réglages repris d'un profil
+        color = self.engine.target_color
+        if color is not None:
+            self.target_color_rgb = color['rgb']
+            self.target_color_name.set(color['name'])
+            self.target_color_hex = color['hex']
+            self.btn_color_pick.configure(bg=self.target_color_hex, fg=self.get_contrast_color(self.target_color_rgb))
+        self.user_delay.set(str(self.engine.delay))
+        self.lattice_mode.set(self.engine.lattice)
+        self.update_info_label()
+        if self.engine.calibrated:
+            self.btn_start.config(state="normal")
+
+    # --- MODÈLE ---
+    def load_blueprint(self):
+        path = filedialog.askopenfilename(parent=self.root, title="Modèle PNG",
+                                          filetypes=[("Images PNG", "*.png"), ("Toutes les images", "*.*")])
+        if not path:
+            self.engine.load_blueprint(None)
+            self.log("Modèle retiré.")
+        else:
+            try:
+                blueprint = self.engine.load_blueprint(path)
+                self.log(f"Modèle : {blueprint.cols}x{blueprint.rows} cases")
+            except Exception as e:
+                self.engine.load_blueprint(None)
+                self.log(f"Erreur modèle : {e}")
+        self.update_info_label()
+        self.remember_profile()
+
     # --- CALIBRATION ---
     def start_zone_select(self):
         self.toggle_setup_buttons("disabled")
@@ -385,13 +510,30 @@ class WplaceBotApp:
         self.top.bind("<Escape>", self.cancel_overlay)
 
     def on_zone_end(self, event):
-        self.play_area = (min(self.start_x, event.x), min(self.start_y, event.y), max(self.start_x, event.x),
-                          max(self.start_y, event.y))
+        self.engine.play_area = (min(self.start_x, event.x), min(self.start_y, event.y), max(self.start_x, event.x),
+                                 max(self.start_y, event.y))
         self.top.destroy()
-        w, h = self.play_area[2] - self.play_area[0], self.play_area[3] - self.play_area[1]
         self.toggle_setup_buttons("normal")
         self.log("Zone définie !")
         self.update_info_label()
+        self.remember_profile()
+        if not self.engine.calibrated:
+            # Pas encore calibré : on tente de lire la grille dans la zone, une fois l'overlay parti
+            self.root.after(200, self.run_grid_estimate)
+
+    def run_grid_estimate(self):
+        x0, y0, x1, y1 = self.engine.play_area
+        if x1 - x0 < 10 or y1 - y0 < 10:
+            return
+        pic = self.engine.screenshot(region=(x0, y0, x1 - x0, y1 - y0))
+        grid = self.engine.calibrate_from_area(pic, (x0, y0))
+        if grid is None:
+            self.log("Grille non détectée, calibre à la main.")
+            return
+        self.update_info_label()
+        self.remember_profile()
+        self.btn_start.config(state="normal")
+        self.log(f"Grille détectée ! Ref: {grid.pitch:.1f}px.")
 
     def start_auto_calib(self):
         self.toggle_setup_buttons("disabled")
@@ -408,13 +550,11 @@ class WplaceBotApp:
     def run_calib_scan(self, event):
         self.root.update();
         time.sleep(0.1)
-        pic = pyautogui.screenshot()
-        target = pic.load()[event.x, event.y]
-        width, height, bbox = BotVision.measure_blob_at(pic.load(), event.x, event.y, pic.width, pic.height, target, 30)
+        pic = self.engine.screenshot()
+        bbox, size = self.engine.calibrate_at(pic, event.x, event.y)
         self.canvas.delete("all")
         self.canvas.create_rectangle(bbox[0], bbox[1], bbox[2], bbox[3], outline="#ff0000", width=3)
         self.root.update()
-        size = max(width, height)
         if size < 5:
             self.log("Erreur: Trop petit.")
             self.root.after(1000, lambda: (self.top.destroy(), self.toggle_setup_buttons("normal")))
@@ -422,14 +562,17 @@ class WplaceBotApp:
         time.sleep(0.5);
         self.top.destroy()
         self.toggle_setup_buttons("normal")
-        self.full_block_size.set(size)
         self.update_info_label()
+        self.remember_profile()
         self.btn_start.config(state="normal")
         self.log(f"Calibré ! Ref: {size}px.")
 
     def update_info_label(self):
-        txt = f"Ref: {self.full_block_size.get()}px"
-        if self.play_area:
-            w, h = self.play_area[2] - self.play_area[0], self.play_area[3] - self.play_area[1]
+        engine = self.engine
+        txt = f"Ref: {engine.full_block_size}px"
+        if engine.play_area:
+            w, h = engine.play_area[2] - engine.play_area[0], engine.play_area[3] - engine.play_area[1]
             txt += f" | Zone: {w}x{h}"
+        if engine.blueprint is not None:
+            txt += f" | Modèle: {engine.blueprint.cols}x{engine.blueprint.rows}"
         self.lbl_info.config(text=txt, fg="#a6e3a1")
\ No newline at end of file
@@ -1,5 +1,10 @@
+import hashlib
 import json
 import os
+import threading
+import time
+
+import numpy as np
 
 # --- DONNÉES DES COULEURS ---
 RAW_COLORS_DATA = [
@@ -81,14 +86,20 @@ for name, r, g, b in RAW_COLORS_DATA:
     })
 
 # --- GESTION DE LA SAUVEGARDE ---
-import os
-app_data_path = os.getenv('APPDATA')
-app_folder = os.path.join(app_data_path, "ArcPlacer")
+def get_app_folder():
+    """Dossier de config, résolu (et créé) seulement quand on en a besoin.
+
+    %APPDATA%/ArcPlacer sous Windows ; ailleurs (Linux sans écran), ~/.config/ArcPlacer.
+    """
+    app_data_path = os.getenv('APPDATA') or os.path.join(os.path.expanduser("~"), ".config")
+    app_folder = os.path.join(app_data_path, "ArcPlacer")
+    os.makedirs(app_folder, exist_ok=True)
+    return app_folder
+
 
-if not os.path.exists(app_folder):
-    os.makedirs(app_folder)
+def config_file():
+    return os.path.join(get_app_folder(), "config.json")
 
-CONFIG_FILE = os.path.join(app_folder, "config.json")
 
 DEFAULT_CONFIG = {
     "color_name": "Black",
@@ -97,14 +108,28 @@ DEFAULT_CONFIG = {
 
 def load_config():
     """Charge la config depuis AppData"""
-    if not os.path.exists(CONFIG_FILE):
+    path = config_file()
+    if not os.path.exists(path):
         return DEFAULT_CONFIG
     try:
-        with open(CONFIG_FILE, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except:
         return DEFAULT_CONFIG
 
+def write_json_atomic(path, data):
+    """Écrit d'abord un fichier temporaire puis le renomme : jamais de JSON à moitié écrit"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
 def save_config(color_name, delay):
     """Sauvegarde la config dans AppData"""
     data = {
@@ -112,13 +137,394 @@ def save_config(color_name, delay):
         "delay": delay
     }
     try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        write_json_atomic(config_file(), data)
     except Exception as e:
         print(f"Erreur sauvegarde config : {e}")
 
+
+# --- PROFILS PAR ÉCRAN ---
+PROFILE_VERSION = 1
+
+
+def screen_key(size, scale=1.0):
+    """Clé d'un profil : résolution et mise à l'échelle DPI, ex. 2560x1440@1.25"""
+    return f"{int(size[0])}x{int(size[1])}@{float(scale):g}"
+
+
+class ProfileStore:
+    """Profils de calibration (case, zone, grille, tolérance, réglages d'analyse) par écran.
+
+    Un profil n'est valable que pour la résolution et l'échelle DPI de sa clé (screen_key) :
+    en changer donne simplement un autre profil. `put` ne fait que marquer le fichier à
+    réécrire ; l'écriture, atomique, a lieu `debounce` secondes après la dernière
+    modification ou à `flush()`. Les profils d'une autre version ou incohérents avec leur
+    écran (zone hors de l'écran, pas de grille nul...) sont supprimés à la lecture.
+    """
+
+    def __init__(self, path=None, debounce=1.0):
+        self._path = path
+        self.debounce = debounce
+        self.profiles = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self._loaded = False
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = os.path.join(get_app_folder(), "profiles.json")
+        return self._path
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == PROFILE_VERSION:
+            self.profiles = dict(data.get("profiles") or {})
+        else:
+            # Ancien format : on repart de zéro et le fichier sera réécrit
+            self._dirty = True
+
+    @staticmethod
+    def is_valid(key, profile):
+        """Vrai si le profil est cohérent avec l'écran décrit par sa clé"""
+        try:
+            size, _, scale = key.partition("@")
+            w, h = (int(v) for v in size.split("x"))
+            if profile.get("screen") != [w, h] or float(profile.get("scale", 1.0)) != float(scale):
+                return False
+            block = int(profile.get("full_block_size") or 0)
+            if block < 5 or block > max(w, h):
+                return False
+            area = profile.get("play_area")
+            if area is not None:
+                x0, y0, x1, y1 = area
+                if not (0 <= x0 < x1 <= w and 0 <= y0 < y1 <= h):
+                    return False
+            grid = profile.get("grid")
+            if grid is not None and float(grid[2]) <= 0:
+                return False
+        except (TypeError, ValueError, AttributeError):
+            return False
+        return True
+
+    def get(self, key):
+        """Profil de l'écran `key`, ou None (absent ou invalidé)"""
+        with self._lock:
+            self._load()
+            profile = self.profiles.get(key)
+            if profile is None:
+                return None
+            if not self.is_valid(key, profile):
+                del self.profiles[key]
+                self._schedule()
+                return None
+            return dict(profile)
+
+    def put(self, key, profile):
+        with self._lock:
+            self._load()
+            size, _, scale = key.partition("@")
+            profile = dict(profile, screen=[int(v) for v in size.split("x")], scale=float(scale or 1.0))
+            old = dict(self.profiles.get(key) or {})
+            old.pop("saved", None)
+            if old == profile:
+                return
+            self.profiles[key] = dict(profile, saved=time.time())
+            self._schedule()
+
+    def _schedule(self):
+        self._dirty = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.debounce, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Écrit tout de suite les profils modifiés (à appeler avant de quitter)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                write_json_atomic(self.path, {"version": PROFILE_VERSION, "profiles": self.profiles})
+                self._dirty = False
+            except Exception as e:
+                print(f"Erreur sauvegarde profils : {e}")
+
 # --- LOGIQUE DU BOT ---
+# Enregistrement compact d'un blob : bbox inclusive, surface en pixels et centroïde
+BLOB_DTYPE = np.dtype([
+    ("x0", np.int32), ("y0", np.int32), ("x1", np.int32), ("y1", np.int32),
+    ("area", np.int32), ("cx", np.float32), ("cy", np.float32),
+])
+
+# États d'une case échantillonnée sur la grille
+CELL_EMPTY, CELL_PARTIAL, CELL_FULL = 0, 1, 2
+# États mémorisés par CanvasMap en plus des précédents
+CELL_QUARANTINED, CELL_UNKNOWN = 3, 255
+
+
+class BlobBuffer:
+    """Tableau BLOB_DTYPE préalloué et réutilisé d'une frame à l'autre.
+
+    La capacité ne fait que croître, par doublement, jusqu'au plus grand nombre de blobs
+    rencontré ; en régime établi, plus aucune allocation. Les méthodes de remplissage
+    renvoient une vue sur le tampon, valable jusqu'au remplissage suivant.
+    """
+
+    def __init__(self, capacity=256):
+        self.data = np.zeros(capacity, dtype=BLOB_DTYPE)
+        self.size = 0
+        self.grown = 0
+
+    @property
+    def view(self):
+        return self.data[:self.size]
+
+    def reserve(self, n):
+        """Garantit la place pour `n` blobs (le contenu courant est conservé) ; renvoie data[:n]"""
+        if n > len(self.data):
+            data = np.zeros(max(n, 2 * len(self.data)), dtype=BLOB_DTYPE)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+            self.grown += 1
+        return self.data[:n]
+
+    def _filled(self, n):
+        self.size = n
+        return self.data[:n]
+
+    def clear(self):
+        return self._filled(0)
+
+    def set(self, blobs):
+        np.copyto(self.reserve(len(blobs)), blobs)
+        return self._filled(len(blobs))
+
+    def select(self, blobs, keep):
+        """Copie des blobs[keep] (masque booléen)"""
+        n = int(np.count_nonzero(keep))
+        np.compress(keep, blobs, out=self.reserve(n))
+        return self._filled(n)
+
+    def take(self, blobs, index):
+        """Copie de blobs[index] (indices entiers)"""
+        np.take(blobs, index, out=self.reserve(len(index)))
+        return self._filled(len(index))
+
+    def concat(self, parts):
+        n = sum(len(part) for part in parts)
+        if parts:
+            np.concatenate(parts, out=self.reserve(n))
+        return self._filled(n)
+
+
 class BotVision:
+    @staticmethod
+    def to_array(frame):
+        """Convertit une image PIL ou un ndarray en tableau RGB (H, W, 3) uint8"""
+        if isinstance(frame, np.ndarray):
+            arr = frame
+        else:
+            if frame.mode != "RGB":
+                frame = frame.convert("RGB")
+            arr = np.asarray(frame)
+        if arr.ndim != 3 or arr.shape[2] < 3:
+            raise ValueError(f"Image RGB attendue, forme reçue : {arr.shape}")
+        if arr.shape[2] > 3:
+            arr = arr[:, :, :3]
+        if arr.dtype != np.uint8:
+            arr = arr.astype(np.uint8)
+        return arr
+
+    @staticmethod
+    def match_mask(frame, target_rgb, tol):
+        """Masque booléen (H, W) des pixels à moins de `tol` de la cible sur chaque canal"""
+        arr = BotVision.to_array(frame)
+        mask = np.ones(arr.shape[:2], dtype=bool)
+        for c in range(3):
+            # int16 pour éviter le débordement des soustractions uint8
+            diff = arr[:, :, c].astype(np.int16)
+            diff -= int(target_rgb[c])
+            np.abs(diff, out=diff)
+            mask &= diff <= tol
+        return mask
+
+    @staticmethod
+    def _mask_runs(mask):
+        """Découpe le masque en segments horizontaux : (ligne, début, fin exclue)"""
+        h, w = mask.shape
+        padded = np.zeros((h, w + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask
+        edges = np.diff(padded, axis=1)
+        # Les fronts montants et descendants apparaissent dans le même ordre ligne par ligne
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        return rows, starts, ends
+
+    @staticmethod
+    def _union_roots(n, a, b):
+        """Union-find vectorisé sur n éléments reliés deux à deux par (a, b).
+
+        On accroche la racine la plus haute à la plus basse puis on compresse : chaque
+        élément finit sur le plus petit indice de sa composante.
+        """
+        parent = np.arange(n)
+        while len(a):
+            ra, rb = parent[a], parent[b]
+            low, high = np.minimum(ra, rb), np.maximum(ra, rb)
+            pending = low != high
+            if not pending.any():
+                break
+            np.minimum.at(parent, high[pending], low[pending])
+            while True:
+                nxt = parent[parent]
+                if np.array_equal(nxt, parent):
+                    break
+                parent = nxt
+        return parent
+
+    @staticmethod
+    def _label_runs(mask):
+        """Segments du masque et numéro de composante (4-voisinage) de chacun.
+
+        Renvoie (lignes, débuts, fins, étiquettes, nombre de composantes) ; les composantes
+        sont numérotées dans l'ordre de balayage de leur premier pixel.
+        """
+        rows, starts, ends = BotVision._mask_runs(mask)
+        n = len(rows)
+        if n == 0:
+            return rows, starts, ends, np.zeros(0, dtype=np.int64), 0
+
+        # Chevauchements avec la ligne du dessus : clés globales triées (ligne, colonne)
+        stride = mask.shape[1] + 1
+        key_start = rows * stride + starts
+        key_end = rows * stride + ends
+        prev_base = (rows - 1) * stride
+        lo = np.searchsorted(key_end, prev_base + starts, side="right")
+        hi = np.searchsorted(key_start, prev_base + ends, side="left")
+        counts = np.maximum(hi - lo, 0)
+        b = np.repeat(np.arange(n), counts)
+        a = np.repeat(lo, counts) + (np.arange(len(b)) - np.repeat(np.cumsum(counts) - counts, counts))
+
+        parent = BotVision._union_roots(n, a, b)
+        # Les racines sont les premiers segments de chaque blob : déjà dans l'ordre de balayage
+        roots, label = np.unique(parent, return_inverse=True)
+        return rows, starts, ends, label, len(roots)
+
+    @staticmethod
+    def _run_stats(rows, starts, ends, label, count):
+        """Cumuls par composante (count, 7) : x0, y0, x1, y1, surface, somme des x, somme des y"""
+        lengths = ends - starts
+        stats = np.empty((count, 7), dtype=np.float64)
+        x0 = np.full(count, np.iinfo(np.int64).max)
+        y0 = np.full(count, np.iinfo(np.int64).max)
+        x1 = np.full(count, -1)
+        y1 = np.full(count, -1)
+        np.minimum.at(x0, label, starts)
+        np.minimum.at(y0, label, rows)
+        np.maximum.at(x1, label, ends - 1)
+        np.maximum.at(y1, label, rows)
+        stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3] = x0, y0, x1, y1
+        stats[:, 4] = np.bincount(label, weights=lengths, minlength=count)
+        stats[:, 5] = np.bincount(label, weights=lengths * (starts + ends - 1) / 2.0, minlength=count)
+        stats[:, 6] = np.bincount(label, weights=lengths * rows, minlength=count)
+        return stats
+
+    @staticmethod
+    def _stats_to_blobs(stats, offset=(0, 0)):
+        """Tableau BLOB_DTYPE à partir des cumuls de _run_stats (exacts : demi-entiers en float64)"""
+        blobs = np.zeros(len(stats), dtype=BLOB_DTYPE)
+        area = stats[:, 4]
+        blobs["x0"] = stats[:, 0] + offset[0]
+        blobs["y0"] = stats[:, 1] + offset[1]
+        blobs["x1"] = stats[:, 2] + offset[0]
+        blobs["y1"] = stats[:, 3] + offset[1]
+        blobs["area"] = area
+        blobs["cx"] = stats[:, 5] / area + offset[0]
+        blobs["cy"] = stats[:, 6] / area + offset[1]
+        return blobs
+
+    @staticmethod
+    def label_blobs(mask, offset=(0, 0)):
+        """Étiquette toutes les composantes connexes (4-voisinage) du masque en une passe.
+
+        Les segments horizontaux sont reliés à ceux de la ligne précédente qui les chevauchent,
+        puis fusionnés par union-find vectorisé. Renvoie un tableau BLOB_DTYPE dans l'ordre de
+        balayage de leur premier pixel, coordonnées décalées de `offset`.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        rows, starts, ends, label, count = BotVision._label_runs(mask)
+        if count == 0:
+            return np.zeros(0, dtype=BLOB_DTYPE)
+        return BotVision._stats_to_blobs(BotVision._run_stats(rows, starts, ends, label, count), offset)
+
+    @staticmethod
+    def find_blobs(frame, target_rgb, tol, offset=(0, 0)):
+        """Masque de la couleur cible puis étiquetage de tous les blobs de l'image"""
+        return BotVision.label_blobs(BotVision.match_mask(frame, target_rgb, tol), offset)
+
+    @staticmethod
+    def blob_sizes(blobs):
+        """Plus grande dimension (largeur ou hauteur) de chaque blob, comme measure_blob_at"""
+        return np.maximum(blobs["x1"] - blobs["x0"], blobs["y1"] - blobs["y0"]) + 1
+
+    @staticmethod
+    def classify_lattice(frame, frame_origin, grid, target_rgb, tol, inset=0.12):
+        """Classe chaque case visible de `grid` (CellGrid) en vide, partielle ou pleine.
+
+        Cinq sondes par case : le centre et les quatre coins rentrés de `inset` x pas, hors
+        d'un marqueur (< 0.7 x pas). Pleine si toutes correspondent à la cible, vide si aucune.
+        Renvoie (états (lignes, colonnes) uint8, (c0, r0) indices de la première case).
+        """
+        arr = BotVision.to_array(frame)
+        fx, fy = frame_origin
+        h, w = arr.shape[:2]
+        c0, r0, c1, r1 = grid.visible((fx, fy, fx + w, fy + h))
+        cols = np.arange(c0, c1)
+        rows = np.arange(r0, r1)
+
+        def probe(fraction_x, fraction_y):
+            xs = np.clip(np.floor(grid.x0 + (cols + fraction_x) * grid.pitch).astype(np.int64) - fx, 0, w - 1)
+            ys = np.clip(np.floor(grid.y0 + (rows + fraction_y) * grid.pitch).astype(np.int64) - fy, 0, h - 1)
+            return BotVision.match_mask(arr[ys[:, None], xs[None, :]], target_rgb, tol)
+
+        hits = probe(0.5, 0.5).astype(np.uint8)
+        for fx_, fy_ in ((inset, inset), (1 - inset, inset), (inset, 1 - inset), (1 - inset, 1 - inset)):
+            hits += probe(fx_, fy_)
+        states = np.full(hits.shape, CELL_PARTIAL, dtype=np.uint8)
+        states[hits == 0] = CELL_EMPTY
+        states[hits == 5] = CELL_FULL
+        return states, (c0, r0)
+
+    @staticmethod
+    def cells_filled(frame, frame_origin, xs, ys, pitch, target_rgb, tol, inset=0.12):
+        """Vrai pour chaque case centrée en (xs, ys) entièrement de la couleur cible.
+
+        Mêmes cinq sondes que classify_lattice, mais seulement autour des points donnés :
+        de quoi vérifier quelques clics sans analyser toute la frame.
+        """
+        arr = BotVision.to_array(frame)
+        h, w = arr.shape[:2]
+        reach = (0.5 - inset) * pitch
+        dx = np.array([0.0, -reach, reach, -reach, reach])
+        dy = np.array([0.0, -reach, -reach, reach, reach])
+        xs = np.asarray(xs, dtype=np.float64)[:, None] - frame_origin[0]
+        ys = np.asarray(ys, dtype=np.float64)[:, None] - frame_origin[1]
+        px = np.clip(np.floor(xs + dx).astype(np.int64), 0, w - 1)
+        py = np.clip(np.floor(ys + dy).astype(np.int64), 0, h - 1)
+        return BotVision.match_mask(arr[py, px], target_rgb, tol).all(axis=1)
+
     @staticmethod
     def parse_rgb(string_rgb):
         try:
@@ -156,4 +562,864 @@ class BotVision:
 
         width = max_x - min_x + 1
         height = max_y - min_y + 1
-        return width, height, (min_x, min_y, max_x, max_y)
\ No newline at end of file
+        return width, height, (min_x, min_y, max_x, max_y)
+
+
+# --- GRILLE DES CASES ---
+class CellGrid:
+    """Grille des cases à l'écran : coin (x0, y0) de la case (0, 0) et pas en pixels (flottant).
+
+    Les fonctions acceptent des scalaires ou des tableaux NumPy de colonnes / lignes.
+    """
+
+    def __init__(self, x0, y0, pitch):
+        if pitch <= 0:
+            raise ValueError(f"Pas de grille invalide : {pitch}")
+        self.x0, self.y0, self.pitch = float(x0), float(y0), float(pitch)
+
+    def __repr__(self):
+        return f"CellGrid(x0={self.x0:.2f}, y0={self.y0:.2f}, pitch={self.pitch:.3f})"
+
+    def anchored(self, x, y):
+        """Même grille, la case (0, 0) commençant au coin de case le plus proche du point écran (x, y)"""
+        col = round((x - self.x0) / self.pitch)
+        row = round((y - self.y0) / self.pitch)
+        return CellGrid(self.x0 + col * self.pitch, self.y0 + row * self.pitch, self.pitch)
+
+    def cell_at(self, x, y):
+        """(colonne, ligne) de la case qui contient le point écran (x, y)"""
+        return (np.floor((np.asarray(x) - self.x0) / self.pitch).astype(np.int64),
+                np.floor((np.asarray(y) - self.y0) / self.pitch).astype(np.int64))
+
+    def center(self, col, row):
+        """Centre écran (x, y) arrondi au pixel de la case (col, row)"""
+        return (np.floor(self.x0 + (np.asarray(col) + 0.5) * self.pitch).astype(np.int64),
+                np.floor(self.y0 + (np.asarray(row) + 0.5) * self.pitch).astype(np.int64))
+
+    def bbox(self, col, row):
+        """Bbox écran inclusive (x0, y0, x1, y1) de la case (col, row)"""
+        col, row = np.asarray(col), np.asarray(row)
+        x0 = np.ceil(self.x0 + col * self.pitch).astype(np.int64)
+        y0 = np.ceil(self.y0 + row * self.pitch).astype(np.int64)
+        x1 = np.ceil(self.x0 + (col + 1) * self.pitch).astype(np.int64) - 1
+        y1 = np.ceil(self.y0 + (row + 1) * self.pitch).astype(np.int64) - 1
+        return x0, y0, np.maximum(x1, x0), np.maximum(y1, y0)
+
+    def visible(self, region):
+        """Plage (c0, r0, c1, r1), bornes hautes exclues, des cases dont le centre est dans region"""
+        rx0, ry0, rx1, ry1 = region
+        c0 = int(np.ceil((rx0 - self.x0) / self.pitch - 0.5))
+        r0 = int(np.ceil((ry0 - self.y0) / self.pitch - 0.5))
+        c1 = int(np.ceil((rx1 - self.x0) / self.pitch - 0.5))
+        r1 = int(np.ceil((ry1 - self.y0) / self.pitch - 0.5))
+        return c0, r0, max(c0, c1), max(r0, r1)
+
+    def cells_to_blobs(self, cols, rows):
+        """Tableau BLOB_DTYPE des cases données, pour les envoyer au pipeline de clics"""
+        x0, y0, x1, y1 = self.bbox(cols, rows)
+        blobs = np.zeros(len(x0), dtype=BLOB_DTYPE)
+        blobs["x0"], blobs["y0"], blobs["x1"], blobs["y1"] = x0, y0, x1, y1
+        blobs["area"] = (x1 - x0 + 1) * (y1 - y0 + 1)
+        blobs["cx"], blobs["cy"] = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+        return blobs
+
+
+# --- ESTIMATION AUTOMATIQUE DE LA GRILLE ---
+def _run_weights(edges, axis, longest=64):
+    """Pixels de bord (booléens) comptés le long de `axis`, chacun une fois de plus par décalage
+    1, 2, 4... (jusqu'à `longest`) auquel son segment se prolonge : ~ L log L par segment de L px"""
+    n = edges.shape[axis]
+    # Somme sur une vue uint8 : bien plus rapide que count_nonzero par axe
+    profile = edges.view(np.uint8).sum(axis=axis, dtype=np.int32)
+    shift = 1
+    while shift < min(longest, n):
+        head = edges[shift:] if axis == 0 else edges[:, shift:]
+        tail = edges[:-shift] if axis == 0 else edges[:, :-shift]
+        profile += (head & tail).view(np.uint8).sum(axis=axis, dtype=np.int32)
+        shift *= 2
+    return profile.astype(np.float64)
+
+
+def _edge_profiles(arr, step=2, threshold=32):
+    """Bords verticaux par colonne et horizontaux par ligne (une ligne / colonne sur `step`).
+
+    Un pixel de bord pèse d'autant plus que son segment est long : un bord de case court sur
+    toute la case, les côtés d'un marqueur sur un tiers seulement. Sans cela, avec beaucoup de
+    marqueurs ou sur une toile clairsemée, le tiers de case passe pour le pas de la grille.
+    """
+    # Somme des canaux en int16 ; plus rapide que astype().sum(axis=2) sur une grande capture
+    gray = arr[:, :, 0].astype(np.int16) + arr[:, :, 1] + arr[:, :, 2]
+    col_edges = _run_weights(np.abs(np.diff(gray[::step], axis=1)) > threshold, axis=0)
+    row_edges = _run_weights(np.abs(np.diff(gray[:, ::step], axis=0)) > threshold, axis=1)
+    return col_edges, row_edges
+
+
+def _profile_pitch(profile, min_pitch, max_pitch, min_score, keep=0.85):
+    """Période du profil par autocorrélation (FFT), affinée sur les harmoniques.
+
+    Une période candidate n'est retenue que si son pic vaut au moins `keep` fois celui de
+    ses multiples : les bords des marqueurs (tiers de case) donnent des pics secondaires
+    nets, mais plus faibles que celui de la vraie période.
+    """
+    n = len(profile)
+    if n < 2 * min_pitch:
+        return None
+    centered = profile - profile.mean()
+    spectrum = np.fft.rfft(centered, 2 * n)
+    ac = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    if ac[0] <= 0:
+        return None
+    # Estimateur non biaisé : sinon les pics s'affaiblissent avec le décalage
+    ac *= n / (ac[0] * (n - np.arange(n)))
+
+    hi = min(max_pitch, n // 2)
+    if hi <= min_pitch:
+        return None
+    window = ac[min_pitch:hi + 1]
+    # Plus petit décalage dont le pic vaut au moins la moitié du meilleur : évite les harmoniques
+    peaks = np.nonzero((window[1:-1] >= window[:-2]) & (window[1:-1] >= window[2:]))[0] + 1
+    if not len(peaks):
+        return None
+    best = window[peaks].max()
+    if best < min_score:
+        return None
+    lag = int(peaks[np.argmax(window[peaks] >= 0.5 * best)]) + min_pitch
+
+    # Hors des pics, l'autocorrélation d'un profil de bords reste à un niveau de fond négatif
+    floor = float(np.median(ac[1:hi + 1]))
+
+    def peak(x):
+        # Pas fractionnaire (9.5 px : cases de 9 et 10 px en alternance) : le pic s'étale
+        # sur les deux décalages entiers voisins, qui portent chacun une part du fond
+        lo = int(np.floor(x))
+        return ac[lo] if lo == x else ac[lo] + ac[lo + 1] - floor
+
+    # Sous-structure (bords des marqueurs) : un multiple nettement plus fort est la vraie période
+    # (`lag` peut n'être que l'arrondi d'un tiers de case : on cherche le pic autour de m x lag)
+    climbed = True
+    while climbed:
+        climbed = False
+        for m in (2, 3, 4):
+            if m * (lag + 1) > hi:
+                break
+            near = m * (lag - 1) + int(np.argmax(ac[m * (lag - 1):m * (lag + 1) + 1]))
+            if keep * ac[near] > max(ac[lag], ac[lag] + max(ac[lag - 1], ac[lag + 1]) - floor):
+                lag = near
+                climbed = True
+                break
+    # Pas fractionnaire : le pic de la vraie période, étalé, peut rester sous le seuil
+    # alors que 2 x pas tombe juste. On teste donc les sous-multiples de `lag`.
+    pitch = float(lag)
+    for div in (4, 3, 2):
+        sub = lag / div
+        if sub >= min_pitch and peak(sub) >= keep * ac[lag]:
+            pitch = sub
+            break
+    k = 2
+    while k * pitch + 2 < n // 2:
+        lo = max(1, int(round(k * pitch)) - 2)
+        seg = ac[lo:lo + 5]
+        i = int(np.argmax(seg))
+        offset = 0.0
+        if 0 < i < len(seg) - 1:
+            denom = seg[i - 1] - 2 * seg[i] + seg[i + 1]
+            if denom < 0:
+                offset = 0.5 * (seg[i - 1] - seg[i + 1]) / denom
+        pitch = (lo + i + offset) / k
+        k *= 2
+    return pitch
+
+
+def _profile_phase(profile, pitch):
+    """Position (modulo pitch) des bords de case, en repliant le profil sur une période"""
+    # Le bord détecté entre les pixels n et n + 1 commence la case suivante au pixel n + 1
+    positions = np.arange(1, len(profile) + 1, dtype=np.float64)
+    bins = max(8, int(round(pitch)) * 4)
+    folded = np.bincount((np.mod(positions, pitch) / pitch * bins).astype(np.int64) % bins,
+                         weights=profile, minlength=bins)
+    peak = int(np.argmax(folded))
+    # Moyenne circulaire des bords proches du pic (± 1 px) pour la précision sous-pixel
+    angle = 2 * np.pi * np.mod(positions, pitch) / pitch
+    near = np.abs(np.angle(np.exp(1j * (angle - 2 * np.pi * (peak + 0.5) / bins)))) <= 2 * np.pi / pitch
+    mean = np.angle(np.sum(profile[near] * np.exp(1j * angle[near])))
+    # Une case commence au pixel ceil(x0 + k * pitch). Grille calée sur un pixel et pas de
+    # dénominateur q (20 : q = 1, 9.5 : q = 2...) : ces débuts dépassent x0 de (q - 1) / 2q
+    # en moyenne, 0 pour un pas entier ; 0.5 pour un pas quelconque.
+    q = next((q for q in range(1, 17) if abs(pitch * q - round(pitch * q)) < 0.02 * q), None)
+    bias = 0.5 if q is None else (q - 1) / (2 * q)
+    return float(np.mod(mean / (2 * np.pi) * pitch - bias, pitch))
+
+
+def estimate_grid(frame, frame_origin=(0, 0), min_pitch=4, max_pitch=200, min_score=0.05):
+    """Estime le pas et le décalage sous-pixel de la grille directement depuis une capture.
+
+    Autocorrélation des profils de bords (colonnes et lignes) pour le pas, repli des bords sur
+    une période pour l'origine. Renvoie un CellGrid en coordonnées écran, ou None si l'image
+    ne montre pas de grille assez nette.
+    """
+    arr = BotVision.to_array(frame)
+    col_edges, row_edges = _edge_profiles(arr)
+    pitch_x = _profile_pitch(col_edges, min_pitch, max_pitch, min_score)
+    pitch_y = _profile_pitch(row_edges, min_pitch, max_pitch, min_score)
+    pitches = [p for p in (pitch_x, pitch_y) if p is not None]
+    if not pitches:
+        return None
+    if len(pitches) == 2 and abs(pitch_x - pitch_y) > 0.05 * max(pitches):
+        # Axes incohérents : on garde celui qui a le plus de bords
+        pitches = [pitch_x if col_edges.sum() >= row_edges.sum() else pitch_y]
+    pitch = float(np.mean(pitches))
+    x0 = _profile_phase(col_edges, pitch) if len(col_edges) else 0.0
+    y0 = _profile_phase(row_edges, pitch) if len(row_edges) else 0.0
+    return CellGrid(frame_origin[0] + x0, frame_origin[1] + y0, pitch)
+
+
+class GridTracker:
+    """Ré-estime la grille à intervalle régulier et l'adopte quand le pas ou l'origine dérive"""
+
+    def __init__(self, grid=None, interval=2.0, drift=0.02):
+        self.grid = grid
+        self.interval = interval
+        self.drift = drift
+        self.last_check = None
+        self.recalibrations = 0
+
+    def update(self, frame, frame_origin, now):
+        """Renvoie la grille à utiliser pour cette frame (`now` en secondes)"""
+        if self.grid is not None and self.last_check is not None and now - self.last_check < self.interval:
+            return self.grid
+        self.last_check = now
+        found = estimate_grid(frame, frame_origin)
+        if found is None:
+            return self.grid
+        if self.grid is None or self._drifted(found):
+            self.grid = found
+            self.recalibrations += 1
+        return self.grid
+
+    def _drifted(self, found):
+        old = self.grid
+        if abs(found.pitch - old.pitch) > self.drift * old.pitch:
+            return True
+        # Décalage de phase, mesuré modulo le pas
+        for a, b in ((found.x0, old.x0), (found.y0, old.y0)):
+            d = (a - b) % old.pitch
+            if min(d, old.pitch - d) > max(1.0, 0.1 * old.pitch):
+                return True
+        return False
+
+
+# --- DÉPLACEMENT DE LA VUE ---
+def _pan_image(frame, scale):
+    """Niveaux de gris sous-échantillonnés (somme des canaux) pour la corrélation de phase"""
+    small = BotVision.to_array(frame)[::scale, ::scale]
+    return small.sum(axis=2, dtype=np.int16).astype(np.float32)
+
+
+def _refine_shift(prev, cur, dx, dy, radius, step=8, window=512):
+    """Affine (dx, dy) au pixel près par écart absolu moyen entre les deux frames, axe par axe.
+
+    Seule une fenêtre centrale de `window` px de côté est comparée.
+    """
+    h, w = cur.shape[:2]
+    top, left = max(0, (h - window) // 2), max(0, (w - window) // 2)
+    cur = cur[top:top + window, left:left + window]
+    prev = prev[top:top + window, left:left + window]
+    h, w = cur.shape[:2]
+    best = (dx, dy)
+    for axis in (0, 1):
+        scores = []
+        for d in range(-radius, radius + 1):
+            cx, cy = (best[0] + d, best[1]) if axis == 0 else (best[0], best[1] + d)
+            # Zone commune : cur(x, y) = prev(x - cx, y - cy)
+            x0, x1 = max(0, cx), min(w, w + cx)
+            y0, y1 = max(0, cy), min(h, h + cy)
+            if x1 - x0 < step or y1 - y0 < step:
+                scores.append(np.inf)
+                continue
+            # Pleine résolution le long de l'axe affiné, une ligne (ou colonne) sur `step` sinon
+            sy, sx = (step, 1) if axis == 0 else (1, step)
+            a = cur[y0:y1:sy, x0:x1:sx]
+            b = prev[y0 - cy:y1 - cy:sy, x0 - cx:x1 - cx:sx]
+            scores.append(np.abs(a.astype(np.int16) - b).mean())
+        d = int(np.argmin(scores)) - radius
+        best = (best[0] + d, best[1]) if axis == 0 else (best[0], best[1] + d)
+    return best
+
+
+class Viewport:
+    """Suit le déplacement de la toile (défilement) d'une frame à la suivante.
+
+    Corrélation de phase sur la zone sous-échantillonnée d'un facteur `scale`, puis
+    affinage au pixel sur l'image entière. `update` renvoie le décalage (dx, dy) du contenu
+    depuis la frame précédente, (0, 0) si rien n'a bougé, ou None si le pic de corrélation
+    est trop faible (zoom, changement de page : tout ce qui est mémorisé est à oublier).
+    `view` cumule les décalages : position écran du point (0, 0) de la toile.
+    """
+
+    def __init__(self, scale=4, min_score=0.1):
+        self.scale = max(1, int(scale))
+        self.min_score = min_score
+        self.view = (0, 0)
+        self.last_shift = (0, 0)
+        self.pans = 0
+        self._small = None
+        self._frame = None
+        self._window = None
+
+    def reset(self):
+        self._small = None
+        self._frame = None
+
+    def update(self, frame):
+        frame = BotVision.to_array(frame)
+        small = _pan_image(frame, self.scale)
+        prev = self._small
+        shift = (0, 0)
+        if prev is not None and prev.shape == small.shape and not np.array_equal(prev, small):
+            shift = self._correlate(prev, small)
+            # Affiné même autour de (0, 0) : un glissement lent (moins de scale / 2 px par frame)
+            # n'apparaît pas à l'échelle réduite mais se cumule frame après frame
+            if shift is not None:
+                shift = _refine_shift(self._frame, frame, shift[0] * self.scale, shift[1] * self.scale, self.scale)
+
+        self._small = small
+        if self._frame is None or self._frame.shape != frame.shape:
+            self._frame = frame.copy()
+        else:
+            np.copyto(self._frame, frame)
+        if shift is not None and shift != (0, 0):
+            self.view = (self.view[0] + shift[0], self.view[1] + shift[1])
+            self.pans += 1
+        self.last_shift = shift
+        return shift
+
+    def _correlate(self, prev, cur):
+        h, w = cur.shape
+        if self._window is None or self._window.shape != cur.shape:
+            self._window = np.outer(np.hanning(h), np.hanning(w)).astype(np.float32)
+        fa = np.fft.rfft2((prev - prev.mean()) * self._window)
+        fb = np.fft.rfft2((cur - cur.mean()) * self._window)
+        cross = fb * np.conj(fa)
+        cross /= np.maximum(np.abs(cross), 1e-9)
+        surface = np.fft.irfft2(cross, s=(h, w))
+        peak = int(np.argmax(surface))
+        py, px = divmod(peak, w)
+        if surface.flat[peak] < self.min_score:
+            return None
+        # Pic au-delà de la moitié : décalage négatif
+        dx = px - w if px > w // 2 else px
+        dy = py - h if py > h // 2 else py
+        return int(dx), int(dy)
+
+
+class CanvasMap:
+    """États connus des cases en coordonnées de toile, conservés quand la vue défile.
+
+    Les cases de `cell` px sont repérées par rapport au point (0, 0) de la toile, dont
+    `view` donne la position à l'écran (voir Viewport) ; `pan` suit un défilement sans
+    rien perdre. Une case absente est CELL_UNKNOWN.
+    """
+
+    def __init__(self, cell, view=(0, 0)):
+        self.cell = max(1, int(cell))
+        self.view = tuple(view)
+        self.states = {}
+
+    def pan(self, dx, dy):
+        self.view = (self.view[0] + dx, self.view[1] + dy)
+
+    def key(self, x, y):
+        return (int(x) - self.view[0]) // self.cell, (int(y) - self.view[1]) // self.cell
+
+    def get(self, key):
+        return self.states.get(key, CELL_UNKNOWN)
+
+    def set(self, key, state):
+        self.states[key] = state
+
+    def clear(self):
+        self.states.clear()
+
+    def states_at(self, xs, ys):
+        """États des cases sous les points écran (xs, ys), tableau uint8"""
+        get = self.states.get
+        points = zip(np.asarray(xs).tolist(), np.asarray(ys).tolist())
+        return np.fromiter((get(self.key(x, y), CELL_UNKNOWN) for x, y in points), dtype=np.uint8, count=len(xs))
+
+
+# --- ORDRE DES CLICS ---
+def path_length(points, order=None, start=None):
+    """Longueur du trajet du curseur qui visite `points` dans l'ordre donné, depuis `start`"""
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if order is not None:
+        pts = pts[order]
+    if start is not None:
+        pts = np.vstack([np.asarray(start, dtype=np.float64).reshape(1, 2), pts])
+    if len(pts) < 2:
+        return 0.0
+    return float(np.hypot(*np.diff(pts, axis=0).T).sum())
+
+
+class ClickPlanner:
+    """Ordonne les cibles d'une frame pour réduire le trajet du curseur.
+
+    - "serpentine" : bandes horizontales de `band` pixels, parcourues en alternance
+    - "greedy" : plus proche voisin puis améliorations 2-opt locales (chemin ouvert, segments
+      d'au plus `window` cibles)
+    - "auto" : greedy jusqu'à `greedy_limit` cibles, serpentine au-delà
+
+    Après chaque plan, `last_length` et `last_raster_length` donnent les longueurs du trajet
+    planifié et du trajet dans l'ordre de balayage, pour mesurer le gain.
+    """
+
+    def __init__(self, method="auto", band=None, greedy_limit=300, two_opt_passes=2, window=48):
+        self.method = method
+        self.band = band
+        self.greedy_limit = greedy_limit
+        self.two_opt_passes = two_opt_passes
+        self.window = window
+        self.last_length = 0.0
+        self.last_raster_length = 0.0
+
+    def plan(self, points, start=None):
+        """Indices des points dans l'ordre de clic"""
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n = len(pts)
+        if n < 3:
+            order = np.arange(n)
+        elif self.method == "serpentine" or (self.method == "auto" and n > self.greedy_limit):
+            order = self._serpentine(pts)
+        else:
+            order = self._two_opt(pts, self._greedy(pts, start), start)
+        raster = np.lexsort((pts[:, 0], pts[:, 1]))
+        self.last_length = path_length(pts, order, start)
+        self.last_raster_length = path_length(pts, raster, start)
+        return order
+
+    def _serpentine(self, pts):
+        # Bandes à l'échelle de l'espacement moyen des cibles, jamais plus fines que `band` (pas de grille)
+        span = np.ptp(pts, axis=0)
+        band = max(self.band or 1.0, float(np.sqrt(max(span[0] * span[1], 1.0) / len(pts))))
+        rows = np.floor(pts[:, 1] / band).astype(np.int64)
+        x = np.where(rows % 2 == 0, pts[:, 0], -pts[:, 0])
+        return np.lexsort((x, rows))
+
+    @staticmethod
+    def _greedy(pts, start):
+        n = len(pts)
+        remaining = np.ones(n, dtype=bool)
+        order = np.empty(n, dtype=np.int64)
+        current = pts[0] if start is None else np.asarray(start, dtype=np.float64)
+        dist = np.empty(n)
+        for k in range(n):
+            np.hypot(pts[:, 0] - current[0], pts[:, 1] - current[1], out=dist)
+            dist[~remaining] = np.inf
+            i = int(np.argmin(dist))
+            order[k] = i
+            remaining[i] = False
+            current = pts[i]
+        return order
+
+    def _two_opt(self, pts, order, start):
+        # Le départ (curseur) est un nœud fixe en tête du chemin
+        fixed = start is not None
+        path = np.vstack([np.asarray(start, dtype=np.float64).reshape(1, 2), pts[order]]) if fixed else pts[order]
+        idx = np.concatenate([[-1], order]) if fixed else order.copy()
+        n = len(path)
+        for _ in range(self.two_opt_passes):
+            improved = False
+            for i in range(n - 2):
+                a, b = path[i], path[i + 1]
+                ab = np.hypot(*(a - b))
+                end = min(n, i + 2 + self.window)
+                c = path[i + 2:end]
+                # Inverser path[i+1 .. j] : arêtes (a, c) et (b, d) ; pas de d si j est le dernier point
+                d = path[i + 3:end + 1]
+                if len(d) < len(c):
+                    d = np.vstack([d, [b]])
+                ac = np.hypot(c[:, 0] - a[0], c[:, 1] - a[1])
+                bd = np.hypot(d[:, 0] - b[0], d[:, 1] - b[1])
+                cd = np.hypot(d[:, 0] - c[:, 0], d[:, 1] - c[:, 1])
+                if end == n:
+                    cd[-1] = 0.0
+                delta = ac + bd - ab - cd
+                k = int(np.argmin(delta))
+                if delta[k] < -1e-9:
+                    j = i + 2 + k
+                    path[i + 1:j + 1] = path[i + 1:j + 1][::-1].copy()
+                    idx[i + 1:j + 1] = idx[i + 1:j + 1][::-1].copy()
+                    improved = True
+            if not improved:
+                break
+        return idx[1:] if fixed else idx
+
+
+# --- INDEX SPATIAL DES ZONES TRAITÉES ---
+class ZoneGrid:
+    """Carte d'occupation sous-échantillonnée des zones déjà traitées.
+
+    Chaque case de `cell` pixels garde le numéro de la frame (époque) qui l'a marquée :
+    le test d'appartenance est une simple lecture de tableau et `clear()` n'a qu'à
+    incrémenter l'époque, sans réallouer ni remettre le tableau à zéro.
+    Une zone marquée avec PINNED reste occupée jusqu'à ce qu'on la remarque.
+    """
+
+    PINNED = int(np.iinfo(np.uint32).max)
+
+    def __init__(self, width, height, cell=4, origin=(0, 0)):
+        self.cell = max(1, int(cell))
+        self.origin = origin
+        self.stamps = np.zeros((0, 0), dtype=np.uint32)
+        self.epoch = 1
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        """Adapte la grille à une nouvelle zone, en ne réallouant que si elle grandit"""
+        rows = -(-int(height) // self.cell)
+        cols = -(-int(width) // self.cell)
+        if rows > self.stamps.shape[0] or cols > self.stamps.shape[1]:
+            self.stamps = np.zeros((max(rows, self.stamps.shape[0]), max(cols, self.stamps.shape[1])),
+                                   dtype=np.uint32)
+            self.epoch = 1
+        self.rows, self.cols = rows, cols
+
+    def clear(self):
+        """Passe à l'époque suivante : les zones marquées avant deviennent anciennes"""
+        self.epoch += 1
+        if self.epoch >= self.PINNED - 1:
+            self.stamps.fill(0)
+            self.epoch = 1
+
+    def _cells(self, x, y):
+        return (y - self.origin[1]) // self.cell, (x - self.origin[0]) // self.cell
+
+    def unpin(self):
+        """Les zones PINNED redeviennent de simples marques de l'époque courante"""
+        self.stamps[self.stamps == self.PINNED] = self.epoch
+
+    def shift(self, dx, dy):
+        """Suit un défilement du contenu de (dx, dy) px, arrondi à la case ; le bord découvert est libre"""
+        dc, dr = int(round(dx / self.cell)), int(round(dy / self.cell))
+        if not dc and not dr:
+            return
+        old = self.stamps[:self.rows, :self.cols].copy()
+        self.stamps[:self.rows, :self.cols] = 0
+        if abs(dr) < self.rows and abs(dc) < self.cols:
+            self.stamps[max(0, dr):self.rows + min(0, dr), max(0, dc):self.cols + min(0, dc)] = \
+                old[max(0, -dr):self.rows - max(0, dr), max(0, -dc):self.cols - max(0, dc)]
+
+    def add(self, bbox, stamp=None):
+        """Marque la bbox inclusive (x0, y0, x1, y1) pour l'époque courante (ou `stamp`)"""
+        r0, c0 = self._cells(bbox[0], bbox[1])
+        r1, c1 = self._cells(bbox[2], bbox[3])
+        r0, c0 = max(r0, 0), max(c0, 0)
+        r1, c1 = min(r1, self.rows - 1), min(c1, self.cols - 1)
+        if r0 <= r1 and c0 <= c1:
+            self.stamps[r0:r1 + 1, c0:c1 + 1] = self.epoch if stamp is None else stamp
+
+    def add_blobs(self, blobs):
+        """Marque les bbox d'un tableau BLOB_DTYPE"""
+        for bbox in zip(blobs["x0"].tolist(), blobs["y0"].tolist(), blobs["x1"].tolist(), blobs["y1"].tolist()):
+            self.add(bbox)
+
+    def contains_many(self, xs, ys, age=0):
+        """Masque des points (xs, ys) marqués pendant les `age` dernières époques (0 = époque courante)"""
+        r, c = self._cells(np.asarray(xs), np.asarray(ys))
+        inside = (r >= 0) & (r < self.rows) & (c >= 0) & (c < self.cols)
+        result = np.zeros(inside.shape, dtype=bool)
+        stamps = self.stamps[r[inside], c[inside]].astype(np.int64)
+        result[inside] = (stamps > 0) & (stamps + age >= self.epoch)
+        return result
+
+
+# --- RESCAN INCRÉMENTAL PAR TUILES ---
+def _rects_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _merge_rects(rects):
+    """Fusionne les rectangles (x0, y0, x1 exclu, y1 exclu) qui se chevauchent"""
+    rects = [list(r) for r in rects]
+    i = 0
+    while i < len(rects):
+        merged = False
+        j = i + 1
+        while j < len(rects):
+            if _rects_overlap(rects[i], rects[j]):
+                a, b = rects[i], rects.pop(j)
+                rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                merged = True
+            else:
+                j += 1
+        if not merged:
+            i += 1
+    return rects
+
+
+def _blobs_in_rect(blobs, rect):
+    """Blobs dont la bbox inclusive touche le rectangle (x1, y1 exclus)"""
+    return ((blobs["x0"] < rect[2]) & (blobs["x1"] >= rect[0]) &
+            (blobs["y0"] < rect[3]) & (blobs["y1"] >= rect[1]))
+
+
+class TileScanner:
+    """Détection de blobs incrémentale entre deux frames successives.
+
+    La frame est comparée tuile par tuile à la précédente ; seules les zones modifiées
+    (élargies d'une tuile puis des blobs en cache qui les touchent) sont ré-étiquetées,
+    le reste des blobs est repris du cache. Le résultat est identique à un
+    BotVision.find_blobs complet, trié par (y0, x0).
+    `last_label_time` donne la part du dernier scan passée à étiqueter les blobs.
+    `find_all(frame, offset)` remplace find_blobs pour les scans complets et pour les zones
+    modifiées d'au moins `parallel_rows` lignes (ParallelScanner).
+    Le cache et le résultat vivent dans des BlobBuffer : `scan` renvoie une vue, valable
+    jusqu'au scan suivant.
+    """
+
+    def __init__(self, target_rgb, tol, tile=64, find_all=None, parallel_rows=256):
+        self.target_rgb = tuple(target_rgb)
+        self.tol = tol
+        self.tile = max(8, int(tile))
+        self.find_all = find_all
+        self.parallel_rows = parallel_rows
+        self._cache = BlobBuffer()
+        self._scratch = BlobBuffer()
+        self._out = BlobBuffer()
+        self.reset()
+
+    def reset(self):
+        """Oublie la frame précédente : le prochain scan sera complet"""
+        self.prev = None
+        self.forced = []
+        self._cache.clear()
+        self.last_rescanned = 0.0
+        self.last_label_time = 0.0
+
+    @property
+    def blobs(self):
+        """Blobs en cache de la dernière frame, triés par (y0, x0), sans décalage"""
+        return self._cache.view
+
+    def _find(self, frame, offset=(0, 0)):
+        mask = BotVision.match_mask(frame, self.target_rgb, self.tol)
+        t0 = time.perf_counter()
+        blobs = BotVision.label_blobs(mask, offset)
+        self.last_label_time += time.perf_counter() - t0
+        return blobs
+
+    def _find_large(self, frame, offset=(0, 0)):
+        """_find, réparti sur les processus de `find_all` si la zone est assez haute"""
+        if self.find_all is None or frame.shape[0] < self.parallel_rows:
+            return self._find(frame, offset)
+        t0 = time.perf_counter()
+        blobs = self.find_all(frame, offset)
+        self.last_label_time += time.perf_counter() - t0
+        return blobs
+
+    def _full_scan(self, frame):
+        self.prev = frame.copy()
+        self.forced = []
+        self._store_sorted(self._find_large(frame))
+        self.last_rescanned = 1.0
+
+    def _store_sorted(self, blobs):
+        self._cache.take(blobs, np.lexsort((blobs["x0"], blobs["y0"])))
+
+    def shift(self, dx, dy):
+        """Suit un défilement du contenu de (dx, dy) px (voir Viewport).
+
+        La frame et les blobs en cache sont décalés : au scan suivant, seules la bande
+        découverte, les blobs coupés par le bord et les vraies modifications sont ré-étiquetés.
+        """
+        if self.prev is None or (not dx and not dy):
+            return
+        h, w = self.prev.shape[:2]
+        if abs(dx) >= w or abs(dy) >= h:
+            self.reset()
+            return
+        old = self.prev
+        self.prev = np.zeros_like(old)
+        self.prev[max(0, dy):h + min(0, dy), max(0, dx):w + min(0, dx)] = \
+            old[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)]
+
+        blobs = self._cache.view
+        for key, delta in (("x0", dx), ("x1", dx), ("cx", dx), ("y0", dy), ("y1", dy), ("cy", dy)):
+            blobs[key] += delta
+        inside = (blobs["x1"] >= 0) & (blobs["x0"] < w) & (blobs["y1"] >= 0) & (blobs["y0"] < h)
+        whole = inside & (blobs["x0"] >= 0) & (blobs["x1"] < w) & (blobs["y0"] >= 0) & (blobs["y1"] < h)
+        # Bandes découvertes, élargies d'une tuile comme les zones modifiées
+        t = self.tile
+        forced = []
+        if dx:
+            forced.append([0, 0, min(w, dx + t), h] if dx > 0 else [max(0, w + dx - t), 0, w, h])
+        if dy:
+            forced.append([0, 0, w, min(h, dy + t)] if dy > 0 else [0, max(0, h + dy - t), w, h])
+        # Blobs coupés par le bord : leur partie visible est ré-étiquetée en entier
+        for b in blobs[inside & ~whole].tolist():
+            forced.append([max(0, b[0]), max(0, b[1]), min(w, b[2] + 1), min(h, b[3] + 1)])
+        self.forced.extend(forced)
+        # Un décalage ne change pas l'ordre (y0, x0) : les blobs entiers restent triés
+        self._scratch.select(blobs, whole)
+        self._cache, self._scratch = self._scratch, self._cache
+
+    def _dirty_rects(self, frame):
+        """Rectangles pixels à ré-étiqueter, en unités de tuiles élargies d'une tuile"""
+        h, w = frame.shape[:2]
+        # Comparaison octet par octet sur des lignes aplaties (w * 3) : bien plus rapide qu'un any(axis=2)
+        changed = frame.reshape(h, w * 3) != self.prev.reshape(h, w * 3)
+        rows, cols = np.arange(0, h, self.tile), np.arange(0, w, self.tile) * 3
+        dirty = np.logical_or.reduceat(np.logical_or.reduceat(changed, rows, axis=0), cols, axis=1)
+        if not dirty.any():
+            return []
+
+        grown = np.zeros((dirty.shape[0] + 2, dirty.shape[1] + 2), dtype=bool)
+        for dy in range(3):
+            for dx in range(3):
+                grown[dy:dy + dirty.shape[0], dx:dx + dirty.shape[1]] |= dirty
+        grown = grown[1:-1, 1:-1]
+
+        t = self.tile
+        return [[int(b["x0"]) * t, int(b["y0"]) * t, min(w, (int(b["x1"]) + 1) * t), min(h, (int(b["y1"]) + 1) * t)]
+                for b in BotVision.label_blobs(grown)]
+
+    def scan(self, frame, offset=(0, 0)):
+        """Renvoie tous les blobs de la frame en ne ré-analysant que ce qui a changé"""
+        frame = BotVision.to_array(frame)
+        self.last_label_time = 0.0
+        if self.prev is None or self.prev.shape != frame.shape:
+            self._full_scan(frame)
+            return self._with_offset(offset)
+
+        rects = self._dirty_rects(frame) + self.forced
+        self.forced = []
+        if not rects:
+            self.last_rescanned = 0.0
+            return self._with_offset(offset)
+
+        # Un blob en cache qui touche une zone modifiée doit y être entièrement ré-étiqueté
+        cached = self.blobs
+        while True:
+            grew = False
+            for rect in rects:
+                hit = _blobs_in_rect(cached, rect)
+                if hit.any():
+                    grown = [min(rect[0], int(cached["x0"][hit].min())), min(rect[1], int(cached["y0"][hit].min())),
+                             max(rect[2], int(cached["x1"][hit].max()) + 1),
+                             max(rect[3], int(cached["y1"][hit].max()) + 1)]
+                    if grown != rect:
+                        rect[:] = grown
+                        grew = True
+            merged = _merge_rects(rects)
+            grew = grew or len(merged) != len(rects)
+            rects = merged
+            if not grew:
+                break
+
+        stale = np.zeros(len(cached), dtype=bool)
+        parts = []
+        area = 0
+        for x0, y0, x1, y1 in rects:
+            stale |= _blobs_in_rect(cached, (x0, y0, x1, y1))
+            parts.append(self._find_large(frame[y0:y1, x0:x1], (x0, y0)))
+            area += (x1 - x0) * (y1 - y0)
+
+        self._store_sorted(self._scratch.concat([cached[~stale]] + parts))
+        np.copyto(self.prev, frame)
+        self.last_rescanned = area / float(frame.shape[0] * frame.shape[1])
+        return self._with_offset(offset)
+
+    def _with_offset(self, offset):
+        blobs = self._out.set(self._cache.view)
+        if offset != (0, 0):
+            for key, delta in (("x0", 0), ("x1", 0), ("cx", 0), ("y0", 1), ("y1", 1), ("cy", 1)):
+                blobs[key] += offset[delta]
+        return blobs
+
+
+# --- TABLE DE CORRESPONDANCE RGB -> PALETTE ---
+class PaletteLUT:
+    """Classe chaque pixel parmi toutes les couleurs de GAME_COLORS en une seule lecture de table.
+
+    Les canaux sont quantifiés sur `bits` bits ; chaque case de la table contient l'indice de la
+    couleur la plus proche (distance max par canal, comme check_match) si elle est à moins de
+    `tol` du centre de la case, sinon NO_MATCH. Avec `tol=None`, on garde toujours la plus proche.
+    La table est enregistrée dans le dossier de config puis relue en mémoire mappée.
+    """
+
+    NO_MATCH = 255
+    _loaded = {}
+
+    def __init__(self, table, bits, tol):
+        self.table = table
+        self.bits = bits
+        self.shift = 8 - bits
+        self.tol = tol
+
+    @staticmethod
+    def _palette():
+        return np.array([rgb for _, *rgb in RAW_COLORS_DATA], dtype=np.int16)
+
+    @classmethod
+    def build(cls, tol, bits=6):
+        """Calcule la table pour toute la palette (quelques dizaines de ms en 6 bits)"""
+        palette = cls._palette()
+        shift = 8 - bits
+        levels = (np.arange(1 << bits, dtype=np.int16) << shift) + ((1 << shift) >> 1)
+        best = np.full((1 << bits,) * 3, np.iinfo(np.int16).max, dtype=np.int16)
+        table = np.full((1 << bits,) * 3, cls.NO_MATCH, dtype=np.uint8)
+        for i, (r, g, b) in enumerate(palette.tolist()):
+            dist = np.maximum(np.maximum(np.abs(levels - r)[:, None, None], np.abs(levels - g)[None, :, None]),
+                              np.abs(levels - b)[None, None, :])
+            closer = dist < best
+            if tol is not None:
+                closer &= dist <= tol
+            best[closer] = dist[closer]
+            table[closer] = i
+        return cls(table.ravel(), bits, tol)
+
+    @classmethod
+    def cache_path(cls, tol, bits):
+        digest = hashlib.md5(cls._palette().tobytes()).hexdigest()[:8]
+        name = f"palette_{digest}_{bits}b_{'nearest' if tol is None else f't{tol}'}.npy"
+        return os.path.join(get_app_folder(), name)
+
+    @classmethod
+    def load(cls, tol, bits=6):
+        """Table en cache mémoire, sinon sur disque (mmap), sinon calculée puis enregistrée"""
+        key = (tol, bits)
+        if key in cls._loaded:
+            return cls._loaded[key]
+        try:
+            path = cls.cache_path(tol, bits)
+        except OSError:
+            # Dossier de config inaccessible : la table est simplement recalculée à chaque lancement
+            path = None
+        lut = None
+        if path is not None and os.path.exists(path):
+            try:
+                table = np.load(path, mmap_mode="r")
+                if table.shape == (1 << (3 * bits),) and table.dtype == np.uint8:
+                    lut = cls(table, bits, tol)
+            except (OSError, ValueError):
+                lut = None
+        if lut is None:
+            lut = cls.build(tol, bits)
+        if path is not None and not isinstance(lut.table, np.memmap):
+            try:
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, lut.table)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Erreur sauvegarde table palette : {e}")
+        cls._loaded[key] = lut
+        return lut
+
+    def classify(self, frame):
+        """Carte (H, W) uint8 de l'indice palette de chaque pixel (NO_MATCH si aucun)"""
+        arr = BotVision.to_array(frame)
+        bits, shift = self.bits, self.shift
+        index = (arr[:, :, 0] >> shift).astype(np.int32) << (2 * bits)
+        index |= (arr[:, :, 1] >> shift).astype(np.int32) << bits
+        index |= arr[:, :, 2] >> shift
+        return self.table[index]
@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from logic import BotVision, BLOB_DTYPE
+
+
+# --- CÔTÉ PROCESSUS DE CALCUL ---
+# Segments mémoire partagée déjà ouverts par ce processus, par nom
+_attached = {}
+
+
+def _frame_view(name, shape):
+    shm = _attached.get(name)
+    if shm is None:
+        # Le tampon a été recréé (nouvelle taille) : on lâche les anciens
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def _edge_runs(rows, starts, ends, label, row):
+    keep = rows == row
+    return np.stack([starts[keep], ends[keep], label[keep]], axis=1)
+
+
+def _scan_band(name, shape, y0, y1, target_rgb, tol):
+    """Étiquette la bande [y0, y1) de la frame partagée.
+
+    Renvoie les cumuls par composante (BotVision._run_stats, lignes absolues) et les
+    segments (début, fin, composante) de la première et de la dernière ligne, pour les
+    raccorder aux bandes voisines.
+    """
+    frame = _frame_view(name, shape)
+    mask = BotVision.match_mask(frame[y0:y1], target_rgb, tol)
+    rows, starts, ends, label, count = BotVision._label_runs(mask)
+    stats = BotVision._run_stats(rows, starts, ends, label, count)
+    stats[:, 1] += y0
+    stats[:, 3] += y0
+    stats[:, 6] += stats[:, 4] * y0
+    return stats, _edge_runs(rows, starts, ends, label, 0), _edge_runs(rows, starts, ends, label, y1 - y0 - 1)
+
+
+def _seam_pairs(above, below):
+    """Couples (composante du haut, composante du bas) dont les segments se touchent à la couture"""
+    if not len(above) or not len(below):
+        return np.zeros((0, 2), dtype=np.int64)
+    # Segments d'une ligne triés par début, disjoints : mêmes recherches que label_blobs
+    lo = np.searchsorted(above[:, 1], below[:, 0], side="right")
+    hi = np.searchsorted(above[:, 0], below[:, 1], side="left")
+    counts = np.maximum(hi - lo, 0)
+    b = np.repeat(np.arange(len(below)), counts)
+    a = np.repeat(lo, counts) + (np.arange(len(b)) - np.repeat(np.cumsum(counts) - counts, counts))
+    return np.stack([above[a, 2], below[b, 2]], axis=1)
+
+
+# --- ANALYSE PARALLÈLE ---
+class ParallelScanner:
+    """find_blobs réparti sur plusieurs processus, pour les très grandes zones (4K, multi-écrans).
+
+    La frame est copiée une fois par appel dans un segment `shared_memory` que les processus
+    d'un pool persistant lisent sans copie. Chaque processus étiquette une bande de lignes ;
+    les bandes se recouvrent d'une ligne de segments à chaque couture, où les composantes
+    qui se touchent sont fusionnées (union-find). Le résultat est identique, octet pour octet,
+    à BotVision.find_blobs sur la frame entière.
+    """
+
+    def __init__(self, target_rgb, tol, workers=None, bands=None, min_rows=32):
+        self.target_rgb = tuple(target_rgb)
+        self.tol = tol
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.bands = max(1, bands or self.workers * 2)
+        self.min_rows = min_rows
+        # spawn : l'analyse tourne dans un thread, un fork copierait des verrous tenus par les autres threads
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.shm = None
+        self.shape = None
+
+    def _buffer(self, shape):
+        # Les zones modifiées (TileScanner) changent de taille à chaque appel : le segment
+        # n'est recréé que s'il est trop petit, les processus y lisent `shape` depuis le début
+        size = max(1, int(np.prod(shape)))
+        if self.shm is None or self.shm.size < size:
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.shape = shape
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def find_blobs(self, frame, offset=(0, 0)):
+        frame = BotVision.to_array(frame)
+        h = frame.shape[0]
+        bands = min(self.bands, max(1, h // self.min_rows))
+        if bands == 1:
+            return BotVision.find_blobs(frame, self.target_rgb, self.tol, offset)
+
+        np.copyto(self._buffer(frame.shape), frame)
+        cuts = np.linspace(0, h, bands + 1).astype(int)
+        jobs = [self.pool.submit(_scan_band, self.shm.name, frame.shape, int(y0), int(y1), self.target_rgb, self.tol)
+                for y0, y1 in zip(cuts[:-1], cuts[1:])]
+        results = [job.result() for job in jobs]
+
+        # Numérotation globale : les bandes se suivent dans l'ordre de balayage
+        sizes = [len(stats) for stats, _, _ in results]
+        base = np.concatenate([[0], np.cumsum(sizes)])
+        pairs = [_seam_pairs(results[i][2], results[i + 1][1]) + [base[i], base[i + 1]]
+                 for i in range(len(results) - 1)]
+        pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+        stats = np.concatenate([stats for stats, _, _ in results])
+        n = len(stats)
+        if n == 0:
+            return np.zeros(0, dtype=BLOB_DTYPE)
+
+        parent = BotVision._union_roots(n, pairs[:, 0], pairs[:, 1])
+        roots, label = np.unique(parent, return_inverse=True)
+        count = len(roots)
+        merged = np.empty((count, 7), dtype=np.float64)
+        merged[:, 0:2] = np.inf
+        merged[:, 2:4] = -1
+        np.minimum.at(merged[:, 0], label, stats[:, 0])
+        np.minimum.at(merged[:, 1], label, stats[:, 1])
+        np.maximum.at(merged[:, 2], label, stats[:, 2])
+        np.maximum.at(merged[:, 3], label, stats[:, 3])
+        for col in (4, 5, 6):
+            merged[:, col] = np.bincount(label, weights=stats[:, col], minlength=count)
+        return BotVision._stats_to_blobs(merged, offset)
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+            self.shape = None
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self._release()
@@ -0,0 +1,774 @@
+import collections
+import heapq
+import json
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+from logic import BLOB_DTYPE, BlobBuffer, CELL_FULL, CELL_QUARANTINED, CanvasMap, ZoneGrid
+
+
+# --- INSTRUMENTATION ---
+class FrameStats:
+    """Durées par étape et compteurs de chaque frame, avec médianes / p95 glissants.
+
+    L'analyse ouvre un enregistrement par frame (`begin` / `end`) et y ajoute ses durées ;
+    les clics, faits sur un autre thread, sont cumulés puis rattachés à la frame suivante.
+    Avec `trace_path`, chaque enregistrement est ajouté en une ligne JSON au fichier.
+    """
+
+    STAGES = ("capture", "scan", "blobs", "plan", "click")
+    COUNTERS = ("blobs_found", "targets", "clicks")
+
+    def __init__(self, window=200, trace_path=None):
+        self.windows = {name: collections.deque(maxlen=window) for name in self.STAGES}
+        self.totals = dict.fromkeys(self.COUNTERS, 0)
+        self.frames = 0
+        self.record = None
+        self._lock = threading.Lock()
+        self._click_time = 0.0
+        self._clicks = 0
+        self._started = time.perf_counter()
+        self.trace = open(trace_path, "a", encoding="utf-8") if trace_path else None
+
+    def begin(self, frame_id):
+        self.record = dict.fromkeys(self.STAGES, 0.0)
+        self.record.update(dict.fromkeys(self.COUNTERS, 0))
+        self.record["frame"] = frame_id
+        self.record["time"] = time.time()
+
+    def add(self, stage, seconds):
+        self.record[stage] += seconds
+
+    def count(self, name, n):
+        self.record[name] += int(n)
+
+    def add_click(self, seconds):
+        """Appelé par le thread des clics"""
+        with self._lock:
+            self._click_time += seconds
+            self._clicks += 1
+
+    def end(self):
+        record = self.record
+        with self._lock:
+            record["click"], record["clicks"] = self._click_time, self._clicks
+            self._click_time, self._clicks = 0.0, 0
+        for name in self.STAGES:
+            self.windows[name].append(record[name])
+        for name in self.COUNTERS:
+            self.totals[name] += record[name]
+        self.frames += 1
+        if self.trace is not None:
+            self.trace.write(json.dumps(record) + "\n")
+        self.record = None
+
+    def percentiles(self, stage):
+        """(p50, p95) en secondes sur la fenêtre glissante"""
+        values = self.windows[stage]
+        if not values:
+            return 0.0, 0.0
+        p50, p95 = np.percentile(np.fromiter(values, dtype=np.float64), [50, 95])
+        return float(p50), float(p95)
+
+    def status_line(self):
+        """Résumé court pour la barre d'état : p50/p95 en ms par étape"""
+        parts = []
+        for stage, label in (("capture", "cap"), ("scan", "scan"), ("blobs", "blob"), ("click", "clic")):
+            p50, p95 = self.percentiles(stage)
+            parts.append(f"{label} {p50 * 1000:.0f}/{p95 * 1000:.0f}")
+        fps = self.frames / max(1e-9, time.perf_counter() - self._started)
+        return f"{' '.join(parts)} ms | {fps:.1f} f/s | {self.totals['clicks']} clics"
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+
+# --- VÉRIFICATION DES PLACEMENTS ---
+class PlacementLedger:
+    """Registre des clics, vérifiés sur les frames suivantes.
+
+    Chaque clic est noté avec sa case (`cell` px de côté) et l'époque de capture en cours.
+    Dès la frame `settle` époques plus tard, `check(frame, origin, xs, ys)` (tableau de
+    booléens) dit si ces cases sont remplies : seules les cases cliquées sont lues. Une case
+    ratée repasse après `backoff` s, doublé à chaque échec (plafonné à `max_backoff`) ;
+    après `max_attempts` échecs elle est mise en quarantaine et n'est plus cliquée.
+    Les cases vérifiées ou en quarantaine sont gardées dans `canvas` (CanvasMap), en
+    coordonnées de toile : elles restent écartées quand la vue défile (`pan`).
+    """
+
+    def __init__(self, check, cell, max_attempts=3, backoff=1.0, max_backoff=8.0, settle=2, canvas=None):
+        self.check = check
+        self.cell = max(1, int(cell))
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.settle = settle
+        self.counters = dict.fromkeys(("placed", "failed", "retried", "quarantined"), 0)
+        self._lock = threading.Lock()
+        self._pending = []      # clics à vérifier : (époque, clé, x, y, bbox)
+        self._retries = []      # tas (échéance, clé, x, y, bbox)
+        self._failures = {}     # clé -> échecs consécutifs
+        self._busy = set()      # cases en attente de vérification ou de nouvel essai
+        self.canvas = canvas if canvas is not None else CanvasMap(self.cell)
+
+    def key(self, x, y):
+        return self.canvas.key(x, y)
+
+    def record(self, x, y, bbox, epoch):
+        """Appelé par le thread des clics"""
+        key = self.key(x, y)
+        with self._lock:
+            self._pending.append((epoch, key, x, y, bbox))
+            self._busy.add(key)
+
+    def blocked(self, xs, ys):
+        """Masque des cibles à écarter : case en cours de vérification, en attente ou en quarantaine"""
+        with self._lock:
+            busy = set(self._busy)
+            known = self.canvas.states_at(xs, ys)
+        # Une case vérifiée pleine qui redevient une cible a été modifiée depuis : on la reprend
+        blocked = known == CELL_QUARANTINED
+        if busy:
+            blocked |= np.fromiter((self.key(x, y) in busy for x, y in zip(xs.tolist(), ys.tolist())),
+                                   dtype=bool, count=len(xs))
+        return blocked
+
+    def pan(self, dx, dy, epoch):
+        """La toile a défilé de (dx, dy) px pendant la capture `epoch` : les clics en attente suivent leur case.
+
+        Les clics notés depuis `epoch` sont partis pendant le défilement, sur une cible de
+        l'ancienne vue : on ignore où ils sont tombés, ils sont oubliés sans compter d'échec
+        et l'analyse reverra la case si besoin.
+        """
+        def moved(x, y, bbox):
+            return x + dx, y + dy, (bbox[0] + dx, bbox[1] + dy, bbox[2] + dx, bbox[3] + dy)
+
+        with self._lock:
+            self.canvas.pan(dx, dy)
+            self._pending = [(p[0], p[1]) + moved(*p[2:]) for p in self._pending if p[0] < epoch]
+            self._retries = [r[:2] + moved(*r[2:]) for r in self._retries]
+            self._busy = {p[1] for p in self._pending} | {r[1] for r in self._retries}
+
+    def release(self, x, y):
+        """Réessai dû mais non mis en file : la case redevient une cible ordinaire (ses échecs restent comptés)"""
+        with self._lock:
+            self._busy.discard(self.key(x, y))
+
+    def lost(self):
+        """Vue perdue (zoom, autre page) : plus rien de ce qui est mémorisé n'est localisable"""
+        with self._lock:
+            self._pending, self._retries = [], []
+            self._failures.clear()
+            self._busy.clear()
+            self.canvas.clear()
+
+    def verify(self, frame, origin, epoch, now):
+        """Vérifie les clics mûrs sur cette frame ; renvoie les cibles (BLOB_DTYPE) à recliquer"""
+        with self._lock:
+            ready = [p for p in self._pending if p[0] + self.settle <= epoch]
+            if ready:
+                self._pending = [p for p in self._pending if p[0] + self.settle > epoch]
+            due = []
+            while self._retries and self._retries[0][0] <= now:
+                due.append(heapq.heappop(self._retries))
+        retries = []
+        checks = ready + due
+        if checks:
+            xs = np.array([c[2] for c in checks])
+            ys = np.array([c[3] for c in checks])
+            filled = self.check(frame, origin, xs, ys)
+            with self._lock:
+                for item, ok in zip(ready, filled[:len(ready)].tolist()):
+                    self._settle(item[1], item[2], item[3], item[4], ok, now)
+                for item, ok in zip(due, filled[len(ready):].tolist()):
+                    if ok:
+                        # Remplie entre-temps (clic lent à s'afficher)
+                        self._settle(item[1], item[2], item[3], item[4], True, now)
+                    else:
+                        self.counters["retried"] += 1
+                        retries.append(item[4])
+        out = np.zeros(len(retries), dtype=BLOB_DTYPE)
+        if retries:
+            boxes = np.array(retries, dtype=np.int32)
+            for i, name in enumerate(("x0", "y0", "x1", "y1")):
+                out[name] = boxes[:, i]
+            out["area"] = (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+            out["cx"] = (boxes[:, 0] + boxes[:, 2]) / 2
+            out["cy"] = (boxes[:, 1] + boxes[:, 3]) / 2
+        return out
+
+    def _settle(self, key, x, y, bbox, ok, now):
+        if ok:
+            self.counters["placed"] += 1
+            self._failures.pop(key, None)
+            self._busy.discard(key)
+            self.canvas.set(key, CELL_FULL)
+            return
+        self.counters["failed"] += 1
+        failures = self._failures.get(key, 0) + 1
+        self._failures[key] = failures
+        if failures >= self.max_attempts:
+            self.counters["quarantined"] += 1
+            self.canvas.set(key, CELL_QUARANTINED)
+            self._busy.discard(key)
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+            heapq.heappush(self._retries, (now + delay, key, x, y, bbox))
+
+    def waiting(self, now):
+        """Vrai si des clics attendent une frame pour être vérifiés, ou un réessai est dû"""
+        with self._lock:
+            return bool(self._pending) or (bool(self._retries) and self._retries[0][0] <= now)
+
+    def points(self):
+        """Clics en attente de vérification ou de nouvel essai, (x, y) écran"""
+        with self._lock:
+            return [p[2:4] for p in self._pending] + [r[2:4] for r in self._retries]
+
+    def summary(self):
+        c = self.counters
+        return f"ok {c['placed']} | raté {c['failed']} | réessai {c['retried']} | quarantaine {c['quarantined']}"
+
+
+# --- CADENCE DES ANALYSES ---
+class FrameGovernor:
+    """Ne laisse passer à l'analyse que les captures qui ont changé.
+
+    Chaque capture est réduite à une vignette (un pixel tous les `step`, à garder sous la
+    taille d'un marqueur) comparée à la précédente. Tant qu'elle ne change pas et que rien
+    n'est en cours (cibles en file, clics à vérifier), la capture est jetée et la suivante
+    attend de plus en plus longtemps : `poll` s, puis x `backoff` à chaque fois, jusqu'à
+    `max_interval`. Le premier changement repasse à `poll` : c'est la latence de réveil.
+    Une analyse complète est forcée au moins toutes les `refresh` s (changement plus fin que
+    la vignette). `wake()` (clic ou touche de l'utilisateur, arrêt) interrompt l'attente en
+    cours et repart de `poll`, sans attendre que le changement soit visible à l'écran.
+    """
+
+    def __init__(self, step=4, poll=0.02, max_interval=0.2, backoff=2.0, refresh=5.0):
+        self.step = max(1, int(step))
+        self.poll = poll
+        self.max_interval = max(poll, max_interval)
+        self.backoff = max(1.0, backoff)
+        self.refresh = refresh
+        self.interval = poll
+        self.thumb = None
+        self.last_admit = 0.0
+        self.counters = {"admitted": 0, "skipped": 0}
+        self._woken = threading.Event()
+
+    def admit(self, frame, busy, now):
+        """Vrai si la frame doit être analysée ; sinon appeler `pause()` avant la capture suivante"""
+        small = frame[::self.step, ::self.step]
+        changed = self.thumb is None or self.thumb.shape != small.shape or not np.array_equal(small, self.thumb)
+        if changed:
+            if self.thumb is None or self.thumb.shape != small.shape:
+                self.thumb = np.empty_like(small)
+            np.copyto(self.thumb, small)
+        if changed or busy or now - self.last_admit >= self.refresh:
+            self.interval = self.poll
+            self.last_admit = now
+            self.counters["admitted"] += 1
+            return True
+        self.counters["skipped"] += 1
+        return False
+
+    def pause(self):
+        """Attente avant la prochaine capture après une frame jetée (croissance exponentielle)"""
+        wait = self.interval
+        self.interval = min(self.max_interval, self.interval * self.backoff)
+        return wait
+
+    def sleep(self, seconds):
+        """Attend `seconds` ou jusqu'au prochain `wake()` ; vrai si réveillé"""
+        woken = self._woken.wait(seconds)
+        self._woken.clear()
+        return woken
+
+    def wake(self):
+        """Événement extérieur : la prochaine capture part tout de suite, puis toutes les `poll` s"""
+        self.interval = self.poll
+        self._woken.set()
+
+
+# --- APERÇU ---
+class PreviewFeed:
+    """Dernière frame analysée, réduite, avec ses détections, pour un affichage en direct.
+
+    L'analyse appelle `offer` à chaque frame ; au plus `max_fps` fois par seconde, la frame
+    est sous-échantillonnée (une copie par pas de `step` pixels, sans interpolation) et
+    remplace la précédente. L'affichage lit la plus récente avec `take` quand il le veut :
+    rien ne s'accumule et aucun des deux côtés n'attend l'autre. Le dessin (`render`) se fait
+    côté affichage.
+    """
+
+    COLORS = {"found": (137, 180, 250), "targets": (249, 226, 175), "pending": (243, 139, 168)}
+
+    def __init__(self, max_fps=8, width=480, max_boxes=400):
+        self.interval = 1.0 / max_fps
+        self.width = width
+        self.max_boxes = max_boxes
+        self.version = 0
+        self.closed = False
+        self._next = 0.0
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def offer(self, frame, origin, found, targets, pending=None):
+        """Côté analyse : `found` et `targets` en BLOB_DTYPE, `pending()` -> clics en attente"""
+        now = time.monotonic()
+        if self.closed or now < self._next:
+            return
+        self._next = now + self.interval
+        step = max(1, -(-frame.shape[1] // self.width))
+        small = frame[::step, ::step].copy()
+        latest = (small, step, tuple(origin), self._boxes(found), self._boxes(targets),
+                  np.array(pending() if pending is not None else [], dtype=np.int64).reshape(-1, 2))
+        with self._lock:
+            self._latest = latest
+            self.version += 1
+
+    def _boxes(self, blobs):
+        blobs = blobs[:self.max_boxes]
+        return np.stack([blobs["x0"], blobs["y0"], blobs["x1"], blobs["y1"]], axis=1).astype(np.int64)
+
+    def take(self, seen=-1):
+        """Côté affichage : (version, données) si plus récent que `seen`, sinon None"""
+        with self._lock:
+            if self._latest is None or self.version == seen:
+                return None
+            return self.version, self._latest
+
+    def close(self):
+        self.closed = True
+
+    @classmethod
+    def render(cls, latest):
+        """Image PPM (octets) de la frame réduite avec blobs, cibles et clics en attente superposés"""
+        small, step, origin, found, targets, pending = latest
+        img = small.copy()
+        h, w = img.shape[:2]
+        for name, boxes in (("found", found), ("targets", targets)):
+            color = cls.COLORS[name]
+            if not len(boxes):
+                continue
+            boxes = (boxes - np.array(origin * 2)) // step
+            boxes[:, 0::2] = boxes[:, 0::2].clip(0, w - 1)
+            boxes[:, 1::2] = boxes[:, 1::2].clip(0, h - 1)
+            for x0, y0, x1, y1 in boxes.tolist():
+                img[y0, x0:x1 + 1] = color
+                img[y1, x0:x1 + 1] = color
+                img[y0:y1 + 1, x0] = color
+                img[y0:y1 + 1, x1] = color
+        if len(pending):
+            color = cls.COLORS["pending"]
+            points = (pending - np.array(origin)) // step
+            for x, y in points.tolist():
+                if 0 <= x < w and 0 <= y < h:
+                    img[max(0, y - 3):y + 4, x] = color
+                    img[y, max(0, x - 3):x + 4] = color
+        return b"P6 %d %d 255\n" % (w, h) + img.tobytes()
+
+
+# --- RÉGIONS ---
+class Region:
+    """Zone de la toile à entretenir : rectangle écran, couleurs cibles, priorité et budget de clics.
+
+    `priority` est la part des clics qui revient à la région quand plusieurs ont du travail
+    (priorité 2 : deux fois plus de clics qu'une région de priorité 1) ; `budget` plafonne
+    ses clics par minute (0 : sans limite). `colors` : noms de GAME_COLORS ; les clics ne
+    posant que la couleur choisie, seule celle-ci est admise (vide : la couleur du moteur).
+    """
+
+    def __init__(self, name, rect, colors=(), priority=1.0, budget=0):
+        self.name = str(name)
+        self.rect = tuple(int(v) for v in rect)
+        self.colors = list(colors)
+        self.priority = max(1e-3, float(priority))
+        self.budget = max(0, int(budget))
+
+    def contains(self, xs, ys):
+        x0, y0, x1, y1 = self.rect
+        return (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+
+    def to_dict(self):
+        return {"name": self.name, "rect": list(self.rect), "colors": self.colors, "priority": self.priority,
+                "budget": self.budget}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["rect"], data.get("colors") or (), data.get("priority", 1.0),
+                   data.get("budget", 0))
+
+
+class RegionScheduler:
+    """File de cibles commune à plusieurs régions, servie par weighted fair queuing.
+
+    Chaque région garde ses cibles dans l'ordre d'arrivée (celui du planificateur). À
+    l'entrée, une cible reçoit une étiquette de fin virtuelle : max(horloge, dernière
+    étiquette de sa région) + 1 / priorité. Le thread des clics prend toujours la plus
+    petite étiquette en tête de file parmi les régions sous leur budget, et l'horloge passe
+    à cette étiquette. Une région très chargée ne peut donc pas affamer les autres, et tant
+    qu'une région a du travail dans son budget, les clics ne s'arrêtent pas.
+
+    `get`, `get_nowait` et `empty` se comportent comme ceux de queue.Queue ; l'analyse
+    ajoute sans jamais bloquer avec `offer` (au plus `maxsize` cibles par région).
+    """
+
+    WINDOW = 60.0
+
+    def __init__(self, regions=None, maxsize=256):
+        self.regions = list(regions) if regions else [Region("zone", (0, 0, 0, 0))]
+        self.maxsize = maxsize
+        count = len(self.regions)
+        self.clock = 0.0
+        self._queues = [collections.deque() for _ in range(count)]
+        self._finish = [0.0] * count
+        # Instants des clics servis sur la dernière minute : budget et débit
+        self._served = [collections.deque() for _ in range(count)]
+        self.counters = {name: [0] * count for name in ("queued", "served", "dropped")}
+        self._cond = threading.Condition()
+
+    def locate(self, xs, ys):
+        """Indice de la première région qui contient chaque point (0 si aucune)"""
+        index = np.zeros(len(xs), dtype=np.int64)
+        found = np.zeros(len(xs), dtype=bool)
+        for i, region in enumerate(self.regions):
+            hit = ~found & region.contains(xs, ys)
+            index[hit] = i
+            found |= hit
+        return index
+
+    def full(self, region):
+        with self._cond:
+            return len(self._queues[region]) >= self.maxsize
+
+    def offer(self, region, item):
+        """Ajoute une cible de la région `region` (indice) ; faux si sa file est pleine"""
+        with self._cond:
+            pending = self._queues[region]
+            if len(pending) >= self.maxsize:
+                self.counters["dropped"][region] += 1
+                return False
+            tag = max(self.clock, self._finish[region]) + 1.0 / self.regions[region].priority
+            self._finish[region] = tag
+            pending.append((tag, item))
+            self.counters["queued"][region] += 1
+            self._cond.notify()
+            return True
+
+    def _pick(self, now):
+        """(région à servir ou None, attente avant qu'un budget se libère ou None)"""
+        best, wait = None, None
+        for i, pending in enumerate(self._queues):
+            served = self._served[i]
+            while served and served[0] <= now - self.WINDOW:
+                served.popleft()
+            if not pending:
+                continue
+            budget = self.regions[i].budget
+            if budget and len(served) >= budget:
+                free = served[0] + self.WINDOW - now
+                wait = free if wait is None else min(wait, free)
+            elif best is None or pending[0][0] < self._queues[best][0][0]:
+                best = i
+        return best, wait
+
+    def get(self, timeout=None):
+        """Prochaine cible à cliquer ; queue.Empty si rien n'est servable avant `timeout`"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                best, wait = self._pick(now)
+                if best is not None:
+                    tag, item = self._queues[best].popleft()
+                    self.clock = tag
+                    self._served[best].append(now)
+                    self.counters["served"][best] += 1
+                    return item
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                if wait is not None:
+                    remaining = wait if remaining is None else min(wait, remaining)
+                self._cond.wait(remaining)
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def empty(self):
+        with self._cond:
+            return not any(self._queues)
+
+    def clear(self):
+        """Abandonne toutes les cibles en file (vue déplacée)"""
+        with self._cond:
+            for pending in self._queues:
+                pending.clear()
+            self._finish = [self.clock] * len(self._finish)
+
+    def stats(self):
+        """Par région : file, cibles reçues, servies, refusées (file pleine) et débit en clics/min"""
+        # Clics de la dernière fenêtre, même pas encore remplie : on reste comparable au budget par minute
+        with self._cond:
+            self._pick(time.monotonic())
+            return [{"name": region.name, "backlog": len(self._queues[i]), "queued": self.counters["queued"][i],
+                     "served": self.counters["served"][i], "dropped": self.counters["dropped"][i],
+                     "rate": len(self._served[i]) * 60.0 / self.WINDOW}
+                    for i, region in enumerate(self.regions)]
+
+    def summary(self):
+        return " | ".join(f"{s['name']} {s['rate']:.0f}/min, {s['backlog']} en file" for s in self.stats())
+
+
+# --- PIPELINE CAPTURE / ANALYSE / CLICS ---
+class BotPipeline:
+    """Fait tourner le bot en trois étages reliés par des files bornées.
+
+    - capture : remplit des tampons tournants depuis `source` (FrameSource) ; le `governor`
+      (FrameGovernor) écarte les captures identiques quand il n'y a rien en cours
+    - analyse : `analyze(frame, origin)` renvoie les cibles de la frame (tableau BLOB_DTYPE,
+      déjà dans l'ordre de clic), ou (cibles, indices de région) avec plusieurs régions ;
+      elles partent dans la file du `scheduler` (RegionScheduler, une seule région par défaut)
+    - clics : `click(x, y)` au centre de chaque cible, espacé par le délai utilisateur
+
+    L'analyse de la frame N+1 se fait donc pendant les clics de la frame N. Une cible en
+    attente ou cliquée trop récemment pour apparaître à l'écran n'est pas remise en file.
+    Avec un `planner` (ClickPlanner), les cibles de chaque frame sont réordonnées pour
+    raccourcir le trajet du curseur. Avec un `ledger` (PlacementLedger), chaque clic est
+    vérifié sur une frame suivante et les cases ratées sont recliquées en priorité. Avec un
+    `viewport` (Viewport), le défilement de la toile est suivi : zones, registre et cibles en
+    attente sont recalés au lieu d'être reconstruits ; `analyze` peut lire viewport.last_shift
+    pour en faire autant. Avec un `preview` (PreviewFeed), chaque frame analysée lui est
+    proposée avec ses détections. Les durées de chaque étage vont dans `stats` (FrameStats) ;
+    `analyze` peut y ajouter la part passée sur les blobs avec stats.add("blobs", ...).
+    """
+
+    def __init__(self, source, analyze, click, delay, jitter=0.3, cell=4, max_targets=256, planner=None,
+                 stats=None, ledger=None, viewport=None, preview=None, governor=None, scheduler=None, on_stop=None):
+        self.source = source
+        self.analyze = analyze
+        self.click = click
+        self.delay = max(0.01, delay)
+        self.jitter = jitter
+        self.governor = governor if governor is not None else FrameGovernor()
+        self.on_stop = on_stop
+        self.planner = planner
+        self.ledger = ledger
+        self.viewport = viewport
+        self.preview = preview
+        self.cursor = None
+        self.stats = stats if stats is not None else FrameStats()
+
+        self.stop_event = threading.Event()
+        self.frames = queue.Queue(maxsize=1)
+        self.scheduler = scheduler if scheduler is not None else RegionScheduler(maxsize=max_targets)
+        # Une frame en file, une en analyse, une en capture
+        self.buffers = [np.zeros_like(source.buffer) for _ in range(3)]
+        # Époque = numéro de la dernière frame dont la capture a commencé
+        self.zones = ZoneGrid(source.width, source.height, cell, source.origin)
+        self.threads = []
+        # Cibles filtrées, complétées des réessais puis ordonnées : tampons réutilisés à chaque frame
+        self._kept = BlobBuffer()
+        self._merged = BlobBuffer()
+        self._ordered = BlobBuffer()
+
+        self.frame_count = 0
+        self.target_count = 0
+        self.click_count = 0
+        self.planned_length = 0.0
+        self.raster_length = 0.0
+        # Époque de la dernière frame où la vue a bougé : les cibles plus anciennes sont périmées
+        self.view_epoch = 0
+
+    @property
+    def running(self):
+        return bool(self.threads) and not self.stop_event.is_set()
+
+    def start(self):
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self._guard, args=(self._capture_loop,), name="capture", daemon=True),
+            threading.Thread(target=self._guard, args=(self._analysis_loop,), name="analyse", daemon=True),
+            threading.Thread(target=self._guard, args=(self._click_loop,), name="clics", daemon=True),
+        ]
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.governor.wake()
+
+    def wake(self):
+        """Capture immédiate si la toile était au repos (voir FrameGovernor.wake)"""
+        self.governor.wake()
+
+    def join(self, timeout=None):
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout)
+
+    def _guard(self, loop):
+        try:
+            loop()
+        except Exception as e:
+            print(f"Erreur pipeline ({threading.current_thread().name}) : {e}")
+        finally:
+            was_running = not self.stop_event.is_set()
+            self.stop()
+            if threading.current_thread().name == "analyse":
+                self.stats.close()
+            if was_running and self.on_stop:
+                self.on_stop()
+
+    def _put(self, q, item):
+        """put bloquant qui abandonne dès que le pipeline s'arrête"""
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    # --- ÉTAGES ---
+    def _capture_loop(self):
+        index = 0
+        while not self.stop_event.is_set():
+            self.zones.clear()
+            epoch = self.zones.epoch
+            frame = self.source.grab()
+            if not self.governor.admit(frame, self._busy(), time.monotonic()):
+                self.governor.sleep(self.governor.pause())
+                continue
+            buf = self.buffers[index]
+            np.copyto(buf, frame)
+            if not self._put(self.frames, (epoch, buf, self.source.last_latency)):
+                break
+            index = (index + 1) % len(self.buffers)
+
+    def _busy(self):
+        # Des cibles à cliquer ou des clics à vérifier : chaque frame compte
+        return not self.scheduler.empty() or (self.ledger is not None and self.ledger.waiting(time.monotonic()))
+
+    def _analysis_loop(self):
+        while not self.stop_event.is_set():
+            item = self._get(self.frames)
+            if item is None:
+                break
+            epoch, frame, latency = item
+            self.frame_count += 1
+            stats = self.stats
+            stats.begin(epoch)
+            stats.add("capture", latency)
+            t0 = time.perf_counter()
+            if self.viewport is not None:
+                self._follow_view(self.viewport.update(frame), epoch)
+            targets = self.analyze(frame, self.source.origin)
+            stats.add("scan", time.perf_counter() - t0 - stats.record["blobs"])
+            if isinstance(targets, tuple):
+                targets, region = targets
+            else:
+                region = np.zeros(len(targets), dtype=np.int64)
+            found = targets
+            retried = np.zeros(len(targets), dtype=bool)
+
+            if len(targets):
+                cx = (targets["x0"] + targets["x1"]) // 2
+                cy = (targets["y0"] + targets["y1"]) // 2
+                # Cliquée à l'époque E, une case n'est fiable qu'à partir de la frame E + 2
+                free = ~self.zones.contains_many(cx, cy, age=self.zones.epoch - epoch + 1)
+                if self.ledger is not None:
+                    free &= ~self.ledger.blocked(cx, cy)
+                targets, cx, cy, region = self._kept.select(targets, free), cx[free], cy[free], region[free]
+                retried = retried[free]
+
+            if self.ledger is not None:
+                retries = self.ledger.verify(frame, self.source.origin, epoch, time.monotonic())
+                if len(retries):
+                    targets = self._merged.concat([retries, targets])
+                    cx = (targets["x0"] + targets["x1"]) // 2
+                    cy = (targets["y0"] + targets["y1"]) // 2
+                    region = np.concatenate([self.scheduler.locate(cx[:len(retries)], cy[:len(retries)]), region])
+                    retried = np.concatenate([np.ones(len(retries), dtype=bool), retried])
+
+            if self.planner is not None and len(targets) > 1:
+                t0 = time.perf_counter()
+                order = self.planner.plan(np.stack([cx, cy], axis=1), self.cursor)
+                stats.add("plan", time.perf_counter() - t0)
+                targets, region, retried = self._ordered.take(targets, order), region[order], retried[order]
+                self.planned_length += self.planner.last_length
+                self.raster_length += self.planner.last_raster_length
+
+            if self.preview is not None:
+                self.preview.offer(frame, self.source.origin, found, targets,
+                                   self.ledger.points if self.ledger is not None else None)
+
+            queued = 0
+            for t, r, again in zip(targets.tolist(), region.tolist(), retried.tolist()):
+                bbox = tuple(t[:4])
+                # File de la région pleine : la cible reste libre et sera revue à une frame suivante
+                if self.scheduler.full(r):
+                    if again:
+                        self.ledger.release((bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2)
+                    continue
+                self.zones.add(bbox, ZoneGrid.PINNED)
+                x, y = (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
+                self.scheduler.offer(r, (epoch, x, y, bbox))
+                queued += 1
+                self.target_count += 1
+                self.cursor = (x, y)
+            stats.count("targets", queued)
+            stats.end()
+
+            if not queued and not self.scheduler.empty():
+                # Rien de neuf pendant que des clics attendent : on suit leur rythme.
+                # Quand tout est cliqué, c'est le governor qui espace les captures.
+                self.stop_event.wait(self.delay)
+
+    def _follow_view(self, shift, epoch):
+        if shift == (0, 0):
+            return
+        # Les cibles en file visent l'ancienne position de la toile : on les abandonne
+        self.scheduler.clear()
+        self.zones.unpin()
+        self.cursor = None
+        self.view_epoch = epoch
+        if shift is None:
+            if self.ledger is not None:
+                self.ledger.lost()
+            return
+        self.zones.shift(*shift)
+        if self.ledger is not None:
+            self.ledger.pan(shift[0], shift[1], self.view_epoch)
+
+    def _click_loop(self):
+        while not self.stop_event.is_set():
+            item = self._get(self.scheduler)
+            if item is None:
+                break
+            epoch, x, y, bbox = item
+            if epoch < self.view_epoch:
+                continue
+            t0 = time.perf_counter()
+            self.click(x, y)
+            self.stats.add_click(time.perf_counter() - t0)
+            self.click_count += 1
+            if self.ledger is not None:
+                self.ledger.record(x, y, bbox, self.zones.epoch)
+            self.zones.add(bbox)
+            self.stop_event.wait(self.delay + random.uniform(0, self.delay * self.jitter))
@@ -0,0 +1,197 @@
+"""Enregistrement et relecture de sessions de capture.
+
+Une session est un dossier :
+
+    session.json    zone capturée, taille d'écran, profil (calibration) et format des frames
+    events.jsonl    une ligne par capture {"t", "frame"} et par clic {"t", "click": [x, y]}
+    frames.u8       format "raw" : frames (H, W, 3) uint8 bout à bout, lisibles par np.memmap
+    chunks/*.npz    format "npz" : blocs de `chunk` frames compressés
+
+Les frames identiques à la précédente ne sont pas réécrites : l'événement pointe vers la
+même frame. La relecture passe les frames dans l'analyse du moteur aussi vite que possible,
+clics simulés, sans écran. Une session interrompue (plantage) se relit jusqu'à la dernière
+frame écrite sur le disque.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from capture import FrameSource
+
+SESSION_VERSION = 1
+
+
+# --- ÉCRITURE ---
+class SessionWriter:
+    """Écrit une session dans `path` (créé) ; `add_frame` et `add_click` sont thread-safe"""
+
+    FLUSH = 1.0     # s entre deux vidages des fichiers sur le disque
+
+    def __init__(self, path, region, screen_size, profile=None, fmt="raw", chunk=32):
+        if fmt not in ("raw", "npz"):
+            raise ValueError(f"Format de session inconnu : {fmt}")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.fmt = fmt
+        self.chunk = chunk
+        x0, y0, x1, y1 = region
+        self.meta = {
+            "version": SESSION_VERSION,
+            "format": fmt,
+            "region": [int(x0), int(y0), int(x1), int(y1)],
+            "shape": [int(y1 - y0), int(x1 - x0), 3],
+            "screen": [int(screen_size[0]), int(screen_size[1])],
+            "profile": profile or {},
+            "chunk": chunk,
+            "frames": 0,
+            "clicks": 0,
+            "created": time.time(),
+        }
+        self._lock = threading.Lock()
+        self._prev = None
+        self._pending = []
+        self._t0 = self._flushed = time.perf_counter()
+        self._events = open(os.path.join(path, "events.jsonl"), "w", encoding="utf-8")
+        self._raw = open(os.path.join(path, "frames.u8"), "wb") if fmt == "raw" else None
+        if fmt == "npz":
+            os.makedirs(os.path.join(path, "chunks"), exist_ok=True)
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "session.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=4)
+
+    def _event(self, data):
+        data["t"] = round(time.perf_counter() - self._t0, 6)
+        self._events.write(json.dumps(data) + "\n")
+
+    def add_frame(self, frame):
+        with self._lock:
+            if self._prev is None or not np.array_equal(frame, self._prev):
+                if self._prev is None:
+                    self._prev = frame.copy()
+                else:
+                    np.copyto(self._prev, frame)
+                if self._raw is not None:
+                    self._raw.write(np.ascontiguousarray(frame).tobytes())
+                else:
+                    self._pending.append(frame.copy())
+                    if len(self._pending) == self.chunk:
+                        self._flush_chunk()
+                self.meta["frames"] += 1
+            self._event({"frame": self.meta["frames"] - 1})
+            if time.perf_counter() - self._flushed >= self.FLUSH:
+                self._flushed = time.perf_counter()
+                if self._raw is not None:
+                    self._raw.flush()
+                self._events.flush()
+
+    def _flush_chunk(self):
+        if not self._pending:
+            return
+        index = (self.meta["frames"] - 1) // self.chunk
+        np.savez_compressed(os.path.join(self.path, "chunks", f"{index:06d}.npz"), frames=np.stack(self._pending))
+        self._pending = []
+
+    def add_click(self, x, y):
+        with self._lock:
+            self.meta["clicks"] += 1
+            self._event({"click": [int(x), int(y)]})
+
+    def close(self):
+        with self._lock:
+            if self._events is None:
+                return
+            if self._raw is not None:
+                self._raw.close()
+            self._flush_chunk()
+            self._events.close()
+            self._events = None
+            self._write_meta()
+
+
+class RecordingSource(FrameSource):
+    """Enveloppe une FrameSource et enregistre chaque capture dans un SessionWriter"""
+
+    def __init__(self, source, writer):
+        super().__init__(source.region)
+        self.source = source
+        self.writer = writer
+        self.buffer = source.buffer
+
+    def _fill(self, out):
+        frame = self.source.grab()
+        self.writer.add_frame(frame)
+        if out is not frame:
+            np.copyto(out, frame)
+
+    def close(self):
+        self.source.close()
+        self.writer.close()
+
+
+# --- LECTURE ---
+class Session:
+    """Session enregistrée ; `frame(i)` lit directement dans le fichier (np.memmap) en format raw"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "session.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != SESSION_VERSION:
+            raise ValueError(f"Version de session non prise en charge : {self.meta.get('version')}")
+        self.region = tuple(self.meta["region"])
+        self.shape = tuple(self.meta["shape"])
+        self.screen_size = tuple(self.meta["screen"])
+        self.profile = self.meta.get("profile") or {}
+        self.count = self._count()
+        self.sequence = []
+        self.clicks = []
+        with open(os.path.join(path, "events.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break       # dernière ligne coupée par un plantage
+                if "frame" in event:
+                    self.sequence.append(event["frame"])
+                elif "click" in event:
+                    self.clicks.append(tuple(event["click"]))
+        # Captures dont la frame n'a pas atteint le disque avant un plantage
+        self.sequence = [index for index in self.sequence if index < self.count]
+        self._frames = None
+        self._chunk = (None, None)
+        if self.meta["format"] == "raw" and self.count:
+            self._frames = np.memmap(os.path.join(path, "frames.u8"), dtype=np.uint8, mode="r",
+                                     shape=(self.count,) + self.shape)
+
+    def _count(self):
+        """Frames lisibles : celles présentes sur le disque, `meta["frames"]` n'étant écrit qu'à la fermeture"""
+        if self.meta["format"] == "raw":
+            return os.path.getsize(os.path.join(self.path, "frames.u8")) // int(np.prod(self.shape))
+        if self.meta["frames"]:
+            return self.meta["frames"]
+        chunks = sorted(os.listdir(os.path.join(self.path, "chunks")))
+        if not chunks:
+            return 0
+        with np.load(os.path.join(self.path, "chunks", chunks[-1])) as data:
+            return (len(chunks) - 1) * self.meta["chunk"] + len(data["frames"])
+
+    def frame(self, index):
+        if self._frames is not None:
+            return self._frames[index]
+        size = self.meta["chunk"]
+        number, frames = self._chunk
+        if number != index // size:
+            with np.load(os.path.join(self.path, "chunks", f"{index // size:06d}.npz")) as data:
+                frames = data["frames"]
+            self._chunk = (index // size, frames)
+        return frames[index % size]
+
+    def frames(self):
+        """Frames dans l'ordre des captures (avec les répétitions)"""
+        for index in self.sequence:
+            yield self.frame(index)